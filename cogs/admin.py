@@ -1,117 +1,136 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
+import asyncio
+import gzip
+import io
 import os
-import glob
 import datetime
-import unicodedata # [추가] 표 정렬을 위해 필요
-from modules.logger import bot_logger, LOG_DIR
+import shutil
+from modules.logger import bot_logger, log_event, log_archives, LOG_DIR, LOG_FILE
+from modules.event_store import search_events
+from modules import clock
+from modules.clock import format_kst, format_duration, short_kst, parse_kst_input
+from modules.text_layout import Columns
+
+# 서버 정보가 없을 때의 업로드 한도, 메시지 본문 등을 위한 여유분 (바이트)
+DEFAULT_UPLOAD_LIMIT = 8 * 1024 * 1024
+UPLOAD_MARGIN = 64 * 1024
+
+def _compress_file(path):
+    """텍스트 로그 -> gzip 바이트 (블로킹, 별도 스레드에서 호출)"""
+    buffer = io.BytesIO()
+    with open(path, 'rb') as src, gzip.GzipFile(fileobj=buffer, mode='wb') as dst:
+        shutil.copyfileobj(src, dst)
+    return buffer.getvalue()
+
+def _read_range(path, offset, size):
+    """파일의 일부만 읽기 (블로킹, 별도 스레드에서 호출)"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(size)
+
+# 리포트 파일 형식
+REPORT_FORMATS = [
+    app_commands.Choice(name="텍스트 표 (txt)", value="txt"),
+    app_commands.Choice(name="탭 구분 (tsv, 엑셀/시트에 붙여넣기용)", value="tsv"),
+]
+
+def _tsv_field(value):
+    """TSV 칸 값 (탭/줄바꿈은 공백으로)"""
+    if value is None:
+        return ""
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+def build_report(lines, compress=False):
+    """줄 생성기 -> 메모리 파일 (디스크를 거치지 않음, compress면 gzip)"""
+    buffer = io.BytesIO()
+    out = gzip.GzipFile(fileobj=buffer, mode='wb') if compress else buffer
+    for line in lines:
+        out.write(line.encode('utf-8') + b"\n")
+    if compress:
+        out.close()  # gzip 꼬리 기록 (buffer는 닫히지 않음)
+    buffer.seek(0)
+    return buffer
+
+# /로그검색 이벤트 종류 표시 이름
+EVENT_LABELS = {
+    'borrow': '대여',
+    'return': '반납',
+    'force_return': '강제반납',
+    'tool_add': '도구추가',
+    'tool_remove': '도구삭제',
+    'mining_start': '잠광시작',
+    'mining_end': '잠광종료',
+    'mining_clear': '비움',
+    'mining_alert': '비움알림',
+}
 
 class Admin(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-    # ==========================================
-    # [Internal Helper] 표 정렬 함수 (Admin 전용)
-    # ==========================================
-    def _get_width(self, text):
-        """한글 등 전각 문자는 너비 2, 반각은 1로 계산"""
-        width = 0
-        for char in text:
-            if unicodedata.east_asian_width(char) in ['W', 'F', 'A']:
-                width += 2
-            else:
-                width += 1
-        return width
-
-    def _pad_text(self, text, target_width):
-        """표 정렬을 위한 공백 채우기"""
-        text = str(text) if text else "-"
-        current_width = self._get_width(text)
-        
-        if current_width > target_width:
-            temp = ""
-            curr = 0
-            for char in text:
-                w = 2 if unicodedata.east_asian_width(char) in ['W', 'F', 'A'] else 1
-                if curr + w > target_width - 2: break
-                temp += char
-                curr += w
-            return temp + ".." + " " * (target_width - (curr + 2))
-        else:
-            return text + " " * (target_width - current_width)
-
     # ==========================================
     # [Helper] 자동완성 로직 모음
     # ==========================================
     
     # 1. 로그 날짜 자동완성
     async def log_date_autocomplete(self, interaction: discord.Interaction, current: str):
-        dates = []
+        dates = list(log_archives())
         today_str = datetime.datetime.now().strftime("%Y-%m-%d")
         
-        if os.path.exists(os.path.join(LOG_DIR, "bot.log")):
+        if os.path.exists(os.path.join(LOG_DIR, LOG_FILE)):
             dates.append(today_str)
             
-        for f in glob.glob(os.path.join(LOG_DIR, "bot.log.20*")):
-            date_part = f.split(".")[-1]
-            dates.append(date_part)
-            
-        dates.sort(reverse=True)
+        dates = sorted(set(dates), reverse=True)
         return [app_commands.Choice(name=d, value=d) for d in dates if current in d][:25]
 
     # 2. 도구 카테고리 자동완성
     async def tool_category_autocomplete(self, interaction: discord.Interaction, current: str):
         tools_cog = self.bot.get_cog("Tools")
-        if not tools_cog: return []
+        if not tools_cog or interaction.guild_id is None: return []
         
+        cache = await tools_cog.get_cache(interaction.guild_id)
         return [
             app_commands.Choice(name=t, value=t)
-            for t in sorted(list(tools_cog.cache_categories)) if current in t
-        ][:25]
+            for t in cache.search_categories(current)
+        ]
 
     # 3. 모든 도구 이름 자동완성 (삭제용)
     async def tool_name_autocomplete(self, interaction: discord.Interaction, current: str):
         tools_cog = self.bot.get_cog("Tools")
-        if not tools_cog: return []
+        if not tools_cog or interaction.guild_id is None: return []
 
         selected_category = interaction.namespace.category
+        cache = await tools_cog.get_cache(interaction.guild_id)
         
-        if selected_category and selected_category in tools_cog.cache:
+        if selected_category and selected_category in cache:
             return [
                 app_commands.Choice(name=n, value=n)
-                for n in sorted(tools_cog.cache[selected_category].keys()) 
-                if current in n
-            ][:25]
+                for n in cache.search(selected_category, current)
+            ]
         return []
 
     # 4. [최적화됨] 대여 중인 도구만 자동완성 (강제반납용)
     async def borrowed_tool_name_autocomplete(self, interaction: discord.Interaction, current: str):
         tools_cog = self.bot.get_cog("Tools")
-        if not tools_cog: return []
+        if not tools_cog or interaction.guild_id is None: return []
 
         selected_category = interaction.namespace.category
+        cache = await tools_cog.get_cache(interaction.guild_id)
         
-        if selected_category and selected_category in tools_cog.cache:
-            choices = []
-            for name, info in tools_cog.cache[selected_category].items():
-                # 대여 중인 것(borrower_id가 있는 것)만 필터링
-                if info['borrower_id'] is not None:
-                    # 검색어가 포함된 경우 확인
-                    if not current or current in name:
-                        choices.append(app_commands.Choice(name=name, value=name))
-                        
-                        # [Speed Up] 25개 꽉 차면 즉시 중단 (Early Exit)
-                        if len(choices) >= 25:
-                            break
-            
-            return choices
+        if selected_category and selected_category in cache:
+            # 검색 색인에서 대여 중인 것만 최대 25개
+            return [
+                app_commands.Choice(name=name, value=name)
+                for name in cache.search(selected_category, current, status='borrowed')
+            ]
         return []
 
     # ==========================================
     # [Command 1] 로그 조회
     # ==========================================
-    @app_commands.command(name="로그조회", description="[관리자] 특정 날짜의 로그 파일을 다운로드합니다.")
+    @app_commands.command(name="로그조회", description="[관리자] 특정 날짜의 로그 파일(gzip 압축)을 다운로드합니다.")
     @app_commands.autocomplete(date=log_date_autocomplete)
     @app_commands.default_permissions(administrator=True)
     async def get_log(self, interaction: discord.Interaction, date: str):
@@ -119,34 +138,70 @@ class Admin(commands.Cog):
         file_path = None
         
         if date == today_str:
-            target = os.path.join(LOG_DIR, "bot.log")
+            target = os.path.join(LOG_DIR, LOG_FILE)
             if os.path.exists(target): file_path = target
         else:
-            target = os.path.join(LOG_DIR, f"bot.log.{date}")
-            if os.path.exists(target): file_path = target
+            file_path = log_archives().get(date)
                 
-        if file_path:
-            await interaction.response.send_message(
+        if not file_path:
+            return await interaction.response.send_message("❌ 해당 날짜의 로그 파일을 찾을 수 없습니다.", ephemeral=True)
+
+        await interaction.response.defer(ephemeral=True)
+
+        # 압축 파일은 그대로, 오늘 로그(또는 이전 형식의 텍스트 로그)는 메모리에서 압축 (별도 스레드)
+        if file_path.endswith(".gz"):
+            data = None
+            size = os.path.getsize(file_path)
+        else:
+            data = await asyncio.to_thread(_compress_file, file_path)
+            size = len(data)
+
+        file_name = f"log_{date}.txt.gz"
+        limit = (interaction.guild.filesize_limit if interaction.guild else DEFAULT_UPLOAD_LIMIT) - UPLOAD_MARGIN
+
+        async def read(offset, length):
+            if data is not None:
+                return data[offset:offset + length]
+            return await asyncio.to_thread(_read_range, file_path, offset, length)
+
+        if size <= limit:
+            return await interaction.followup.send(
                 f"📂 **{date}** 로그 파일입니다.",
-                file=discord.File(file_path, filename=f"log_{date}.txt"),
+                file=discord.File(io.BytesIO(await read(0, size)), filename=file_name),
                 ephemeral=True
             )
-        else:
-            await interaction.response.send_message("❌ 해당 날짜의 로그 파일을 찾을 수 없습니다.", ephemeral=True)
+
+        # 업로드 한도를 넘으면 조각으로 나눠 하나씩 전송 (한 번에 한 조각만 메모리에 올림)
+        parts = -(-size // limit)
+        await interaction.followup.send(
+            f"📂 **{date}** 로그 파일이 커서 {parts}개로 나눠 보냅니다.\n"
+            f"받은 뒤 `cat {file_name}.part* > {file_name}` 로 합쳐 주세요.",
+            ephemeral=True
+        )
+        for index in range(parts):
+            chunk = await read(index * limit, limit)
+            await interaction.followup.send(
+                file=discord.File(io.BytesIO(chunk), filename=f"{file_name}.part{index + 1:02d}"),
+                ephemeral=True  # 첫 followup 이후에는 defer의 ephemeral이 이어지지 않음
+            )
 
     # ==========================================
     # [Command 2] 도구 관리 (추가)
     # ==========================================
     @app_commands.command(name="도구관리_추가", description="[관리자] 새로운 도구를 목록에 추가합니다.")
+    @app_commands.guild_only()
     @app_commands.describe(category="도구 종류", name="도구 이름")
     @app_commands.default_permissions(administrator=True)
     @app_commands.autocomplete(category=tool_category_autocomplete)
     async def add_tool(self, interaction: discord.Interaction, category: str, name: str):
-        if await self.bot.db.add_tool(category, name):
+        if await self.bot.db.add_tool(interaction.guild_id, category, name):
             tools_cog = self.bot.get_cog("Tools")
-            if tools_cog: await tools_cog.sync_cache()
+            if tools_cog: (await tools_cog.get_cache(interaction.guild_id)).add_tool(category, name)
             
-            bot_logger.info(f"[+] [Admin] 도구 추가: {category} - {name} by {interaction.user.name}")
+            log_event(
+                f"[+] [Admin] 도구 추가: {category} - {name} by {interaction.user.name}",
+                {'type': 'tool_add', 'guild_id': interaction.guild_id, 'user_id': interaction.user.id, 'category': category, 'tool': name}
+            )
             await interaction.response.send_message(f"✅ **[{category}] {name}** 추가 완료!", ephemeral=True)
         else:
             await interaction.response.send_message("⚠️ 이미 존재하는 도구입니다.", ephemeral=True)
@@ -155,15 +210,19 @@ class Admin(commands.Cog):
     # [Command 3] 도구 관리 (삭제)
     # ==========================================
     @app_commands.command(name="도구관리_삭제", description="[관리자] 기존 도구를 목록에서 삭제합니다.")
+    @app_commands.guild_only()
     @app_commands.describe(category="도구 종류", name="도구 이름")
     @app_commands.default_permissions(administrator=True)
     @app_commands.autocomplete(category=tool_category_autocomplete, name=tool_name_autocomplete)
     async def remove_tool(self, interaction: discord.Interaction, category: str, name: str):
-        if await self.bot.db.remove_tool(category, name):
+        if await self.bot.db.remove_tool(interaction.guild_id, category, name):
             tools_cog = self.bot.get_cog("Tools")
-            if tools_cog: await tools_cog.sync_cache()
+            if tools_cog: (await tools_cog.get_cache(interaction.guild_id)).remove_tool(category, name)
                 
-            bot_logger.info(f"[-] [Admin] 도구 삭제: {category} - {name} by {interaction.user.name}")
+            log_event(
+                f"[-] [Admin] 도구 삭제: {category} - {name} by {interaction.user.name}",
+                {'type': 'tool_remove', 'guild_id': interaction.guild_id, 'user_id': interaction.user.id, 'category': category, 'tool': name}
+            )
             await interaction.response.send_message(f"🗑️ **[{category}] {name}** 삭제 완료!", ephemeral=True)
         else:
             await interaction.response.send_message("⚠️ 존재하지 않는 도구입니다.", ephemeral=True)
@@ -172,13 +231,14 @@ class Admin(commands.Cog):
     # [Command 4] 강제 반납
     # ==========================================
     @app_commands.command(name="강제반납", description="[관리자] 대여 중인 도구를 강제로 반납 처리합니다.")
+    @app_commands.guild_only()
     @app_commands.describe(category="도구 종류", name="도구 이름")
     @app_commands.default_permissions(administrator=True)
     @app_commands.autocomplete(category=tool_category_autocomplete, name=borrowed_tool_name_autocomplete)
     async def force_return(self, interaction: discord.Interaction, category: str, name: str):
         await interaction.response.defer(ephemeral=True)
         
-        status = await self.bot.db.get_tool_status(category, name)
+        status = await self.bot.db.get_tool_status(interaction.guild_id, category, name)
         
         if not status:
             return await interaction.followup.send("❌ 존재하지 않는 도구입니다.")
@@ -191,6 +251,10 @@ class Admin(commands.Cog):
         b_nick = status[2] or ""
         rent_time = status[3]
 
+        # DB 업데이트 (반납 처리 + 이력 기록, 조회 이후 이미 반납됐으면 중단)
+        if not await self.bot.db.force_return(interaction.guild_id, category, name):
+            return await interaction.followup.send(f"👀 **[{category}] {name}**은(는) 이미 반납된 상태입니다.")
+
         # [NEW] DM 발송 로직
         dm_result = ""
         try:
@@ -210,18 +274,15 @@ class Admin(commands.Cog):
         except Exception:
             dm_result = "(DM 실패/유저없음)"
 
-        # DB 업데이트 (반납 처리)
-        await self.bot.db.update_borrow(category, name, None, None, None, None)
-        
-        # 캐시 동기화
+        # 캐시 반영 (해당 도구만)
         tools_cog = self.bot.get_cog("Tools")
-        if tools_cog: await tools_cog.sync_cache()
+        if tools_cog: (await tools_cog.get_cache(interaction.guild_id)).clear_borrower(category, name)
 
         # 레거시 메시지 로그 추가
 
-        now = self.bot.db.get_korea_time()
-        rent_str = rent_time[5:-3] if rent_time else "?"
-        return_str = now[5:-3]
+        now = clock.now()
+        rent_str = short_kst(rent_time)
+        return_str = short_kst(now)
         prev_user = f"{b_nick}({b_name})" if b_nick else b_name
 
         message = (
@@ -233,7 +294,13 @@ class Admin(commands.Cog):
         )
 
         # 로그 및 관리자 응답
-        bot_logger.info(f"[!] [Admin] 강제반납 실행: {category}-{name} (User: {b_id}) {dm_result} by {interaction.user.name}")
+        log_event(
+            f"[!] [Admin] 강제반납 실행: {category}-{name} (User: {b_id}) {dm_result} by {interaction.user.name}",
+            {
+                'type': 'force_return', 'guild_id': interaction.guild_id, 'user_id': b_id, 'category': category, 'tool': name,
+                'duration': now - rent_time if rent_time else None
+            }
+        )
         await interaction.followup.send(f"✅ **[{category}] {name}** 강제 반납 처리가 완료되었습니다. {dm_result}", ephemeral=True)
         
         # 채널 전체를 대상으로 붉은 글씨 공개 로그를 전송
@@ -242,68 +309,70 @@ class Admin(commands.Cog):
     # ==========================================
     # [Command 5] 전체 대여 현황 리포트
     # ==========================================
+    def _rent_report_lines(self, cache, now_str, fmt):
+        """대여 중인 도구 리포트를 한 줄씩 생성"""
+        if fmt == "tsv":
+            yield "종류\t이름\t대여자\t대여자 ID\t대여 시간"
+            for cat, name, info in cache.iter_all_borrowed():
+                nick = info['borrower_nick'] or info['borrower_name']
+                borrowed_at = format_kst(info['borrowed_at']) if info['borrowed_at'] else None
+                yield "\t".join(_tsv_field(v) for v in (cat, name, nick, info['borrower_id'], borrowed_at))
+            return
+
+        yield f"[ 전체 대여 현황 Report - {now_str} ]\n"
+        for cat, name, info in cache.iter_all_borrowed():
+            nick = info['borrower_nick'] or info['borrower_name']
+            borrowed_at = format_kst(info['borrowed_at']) if info['borrowed_at'] else "?"
+            yield f"[{cat}] {name} | 대여자: {nick} | 시간: {borrowed_at}"
+
     @app_commands.command(name="전체대여현황", description="[관리자] 현재 대여 중인 도구 목록만 파일로 확인합니다.")
+    @app_commands.guild_only()
+    @app_commands.describe(fmt="파일 형식 (기본 txt)", compress="gzip으로 압축해서 받기")
+    @app_commands.choices(fmt=REPORT_FORMATS)
     @app_commands.default_permissions(administrator=True)
-    async def report_rent(self, interaction: discord.Interaction):
+    async def report_rent(self, interaction: discord.Interaction, fmt: str = "txt", compress: bool = False):
         tools_cog = self.bot.get_cog("Tools")
         if not tools_cog:
             return await interaction.response.send_message("❌ Tools 모듈이 로드되지 않았습니다.", ephemeral=True)
 
-        lines = []
-        now_str = self.bot.db.get_korea_time()
-        lines.append(f"[ 전체 대여 현황 Report - {now_str} ]\n")
-        
-        count = 0
-        for cat, tools in tools_cog.cache.items():
-            for name, info in tools.items():
-                if info['borrower_id'] is not None:
-                    nick = info['borrower_nick'] or info['borrower_name']
-                    time = info['borrowed_at']
-                    lines.append(f"[{cat}] {name} | 대여자: {nick} | 시간: {time}")
-                    count += 1
-        
+        cache = await tools_cog.get_cache(interaction.guild_id)
+        count = sum(1 for _ in cache.iter_all_borrowed())
         if count == 0:
             return await interaction.response.send_message("👀 현재 대여 중인 도구가 없습니다.", ephemeral=True)
 
-        filename = f"rent_report_{now_str[:10]}.txt"
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write("\n".join(lines))
+        # 캐시에서 바로 메모리 파일로 (임시 파일 없음)
+        now_str = format_kst(clock.now())
+        report = build_report(self._rent_report_lines(cache, now_str, fmt), compress)
+        filename = f"rent_report_{now_str[:10]}.{fmt}" + (".gz" if compress else "")
             
         await interaction.response.send_message(
             f"📂 총 {count}개의 대여 항목이 있습니다.", 
-            file=discord.File(filename), 
+            file=discord.File(report, filename=filename), 
             ephemeral=True
         )
-        os.remove(filename)
 
     # ==========================================
     # [Command 6] 유저 대여 조회
     # ==========================================
     @app_commands.command(name="유저대여조회", description="[관리자] 특정 유저가 대여 중인 도구를 조회합니다.")
+    @app_commands.guild_only()
     @app_commands.describe(user="조회할 유저")
     @app_commands.default_permissions(administrator=True)
     async def admin_user_info(self, interaction: discord.Interaction, user: discord.User):
         # DB 조회 (await 필수)
-        items = await self.bot.db.get_user_borrowed_tools(user.id)
+        items = await self.bot.db.get_user_borrowed_tools(interaction.guild_id, user.id)
         
         if not items:
             return await interaction.response.send_message(f"📜 **{user.display_name}**님은 대여 중인 도구가 없습니다.", ephemeral=True)
         
-        header = f"{self._pad_text('종류', 8)} | {self._pad_text('이름', 20)} | 대여 시간"
+        columns = Columns(8, 20)
+        header = columns.row('종류', '이름', '대여 시간')
         separator = "-" * 45
         
         body = ""
         for category, name, time in items:
-            cat_str = self._pad_text(category, 8)
-            name_str = self._pad_text(name, 20)
-            
             # 시간 포맷 (MM-DD HH:MM)
-            if time:
-                time_str = time[5:-3] # 2024-02-05 14:00:00 -> 02-05 14:00
-            else:
-                time_str = "?"
-                
-            body += f"{cat_str} | {name_str} | {time_str}\n"
+            body += columns.row(category, name, short_kst(time)) + "\n"
         
         msg = f"**[ 🔍 {user.display_name}님의 대여 현황 ]**\n```text\n{header}\n{separator}\n{body}```"
         await interaction.response.send_message(msg, ephemeral=True)
@@ -311,58 +380,244 @@ class Admin(commands.Cog):
     # ==========================================
     # [Command 7] 전체 도구 현황 (파일)
     # ==========================================
-    @app_commands.command(name="전체도구현황", description="[관리자] 대여 여부와 상관없이 등록된 모든 도구 목록을 파일로 확인합니다.")
-    @app_commands.default_permissions(administrator=True)
-    async def all_tool_status(self, interaction: discord.Interaction):
-        # 1. 모든 도구 조회 (await 필수)
-        items = await self.bot.db.get_all_tools()
-        
-        if not items:
-            return await interaction.response.send_message("❌ 등록된 도구가 없습니다.", ephemeral=True)
-        
-        # 2. 파일 내용 작성
-        lines = []
-        now_str = self.bot.db.get_korea_time()
-        
-        lines.append(f"[ 전체 도구 목록 Report ]")
-        lines.append(f"기준 시간: {now_str}")
-        lines.append(f"총 도구 수: {len(items)}개")
-        lines.append("")
-        
-        # 헤더 설정
-        col_cat, col_name, col_stat, col_who = 10, 24, 10, 24
-        header = f"{self._pad_text('종류', col_cat)} | {self._pad_text('이름', col_name)} | {self._pad_text('상태', col_stat)} | {self._pad_text('대여자', col_who)} | 대여 시간"
-        separator = "-" * 95
+    def _tool_report_lines(self, cache, now_str, fmt):
+        """전체 도구 리포트를 한 줄씩 생성"""
+        if fmt == "tsv":
+            yield "종류\t이름\t상태\t대여자\t대여자 ID\t대여 시간"
+            for category, name, info in cache.iter_all():
+                b_id = info['borrower_id']
+                if b_id is None:
+                    row = (category, name, "대여가능", None, None, None)
+                else:
+                    borrowed_at = format_kst(info['borrowed_at']) if info['borrowed_at'] else None
+                    row = (category, name, "대여중", info['borrower_nick'] or info['borrower_name'], b_id, borrowed_at)
+                yield "\t".join(_tsv_field(v) for v in row)
+            return
+
+        yield f"[ 전체 도구 목록 Report ]"
+        yield f"기준 시간: {now_str}"
+        yield f"총 도구 수: {len(cache)}개"
+        yield ""
         
-        lines.append(header)
-        lines.append(separator)
+        # 헤더 설정 (종류 10, 이름 24, 상태 10, 대여자 24, 대여 시간)
+        columns = Columns(10, 24, 10, 24)
+        yield columns.row('종류', '이름', '상태', '대여자', '대여 시간')
+        yield "-" * 95
         
-        for category, name, b_id, b_name, b_nick, time in items:
-            cat_str = self._pad_text(category, col_cat)
-            name_str = self._pad_text(name, col_name)
-            
-            if b_id is None:
+        for category, name, info in cache.iter_all():
+            if info['borrower_id'] is None:
                 # 대여 가능한 상태
-                stat_str = self._pad_text("대여가능", col_stat)
-                who_str = self._pad_text("-", col_who)
-                time_str = "-"
+                yield columns.row(category, name, "대여가능", "-", "-")
             else:
                 # 대여 중인 상태
-                stat_str = self._pad_text("대여중", col_stat)
+                b_name, b_nick = info['borrower_name'], info['borrower_nick']
                 full_name = f"{b_nick}({b_name})" if b_nick else b_name
-                who_str = self._pad_text(full_name, col_who)
-                time_str = time if time else "?"
-                
-            lines.append(f"{cat_str} | {name_str} | {stat_str} | {who_str} | {time_str}")
+                borrowed_at = format_kst(info['borrowed_at']) if info['borrowed_at'] else "?"
+                yield columns.row(category, name, "대여중", full_name, borrowed_at)
+
+    @app_commands.command(name="전체도구현황", description="[관리자] 대여 여부와 상관없이 등록된 모든 도구 목록을 파일로 확인합니다.")
+    @app_commands.guild_only()
+    @app_commands.describe(fmt="파일 형식 (기본 txt)", compress="gzip으로 압축해서 받기")
+    @app_commands.choices(fmt=REPORT_FORMATS)
+    @app_commands.default_permissions(administrator=True)
+    async def all_tool_status(self, interaction: discord.Interaction, fmt: str = "txt", compress: bool = False):
+        tools_cog = self.bot.get_cog("Tools")
+        if not tools_cog:
+            return await interaction.response.send_message("❌ Tools 모듈이 로드되지 않았습니다.", ephemeral=True)
+
+        # 1. 모든 도구 조회 (DB 대신 메모리 캐시)
+        cache = await tools_cog.get_cache(interaction.guild_id)
+        if not len(cache):
+            return await interaction.response.send_message("❌ 등록된 도구가 없습니다.", ephemeral=True)
         
-        # 3. 파일 생성 및 전송
-        filename = f"all_tools_{now_str[:10]}.txt"
+        # 2. 캐시에서 바로 메모리 파일로 (임시 파일 없음)
+        now_str = format_kst(clock.now())
+        report = build_report(self._tool_report_lines(cache, now_str, fmt), compress)
+        filename = f"all_tools_{now_str[:10]}.{fmt}" + (".gz" if compress else "")
+
+        await interaction.response.send_message("📂 **전체 도구 현황**입니다.", file=discord.File(report, filename=filename), ephemeral=True)
+
+    # ==========================================
+    # [Command 8] 도구 캐시 전체 동기화
+    # ==========================================
+    @app_commands.command(name="캐시동기화", description="[관리자] 이 서버의 도구 목록을 DB에서 메모리 캐시로 다시 불러옵니다.")
+    @app_commands.guild_only()
+    @app_commands.default_permissions(administrator=True)
+    async def resync_cache(self, interaction: discord.Interaction):
+        tools_cog = self.bot.get_cog("Tools")
+        if not tools_cog:
+            return await interaction.response.send_message("❌ Tools 모듈이 로드되지 않았습니다.", ephemeral=True)
+
+        cache = await tools_cog.sync_cache(interaction.guild_id)
+        bot_logger.info(f"[*] [Admin] 도구 캐시 동기화 (길드 {interaction.guild_id}) by {interaction.user.name}")
+        await interaction.response.send_message(f"🔄 도구 캐시 동기화 완료! (총 {len(cache)}개)", ephemeral=True)
+
+    # ==========================================
+    # [Command 9] 캐시 통계
+    # ==========================================
+    @app_commands.command(name="캐시통계", description="[관리자] 닉네임/이름 조회 캐시의 적중률을 확인합니다.")
+    @app_commands.default_permissions(administrator=True)
+    async def cache_stats(self, interaction: discord.Interaction):
+        nick = self.bot.db.nicknames.stats()
+        names = self.bot.names.stats()
+        tools_cog = self.bot.get_cog("Tools")
+
+        embed = discord.Embed(title="📊 캐시 통계", color=discord.Color.blue())
+        embed.add_field(
+            name="고정 닉네임 캐시",
+            value=f"보관: {nick['size']}/{nick['maxsize']}명\n적중률: {nick['hit_rate']:.1%} ({nick['hits']}/{nick['hits'] + nick['misses']})",
+            inline=False
+        )
+        embed.add_field(
+            name="표시 이름 조회",
+            value=(
+                f"적중률: {names['hit_rate']:.1%} (요청 {names['requests']}건)\n"
+                f"고정 닉네임 {names['custom']} / 디스코드 캐시 {names['discord_cache']} / TTL 캐시 {names['ttl_cache']}\n"
+                f"REST 조회 성공 {names['fetched']} / 실패 {names['failed']} / 진행 중 {names['pending']}"
+            ),
+            inline=False
+        )
+        if tools_cog:
+            parts = tools_cog.caches.stats()
+            embed.add_field(
+                name="도구 캐시 (길드별)",
+                value=f"적재된 길드: {parts['partitions']}개 (도구 {parts['tools']}개)\n적재 {parts['loads']}회 / 해제 {parts['evictions']}회",
+                inline=False
+            )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    # ==========================================
+    # [Command 10] 시작 타임라인
+    # ==========================================
+    @app_commands.command(name="시작기록", description="[관리자] 봇 시작 단계별 소요 시간을 확인합니다.")
+    @app_commands.default_permissions(administrator=True)
+    async def startup_report(self, interaction: discord.Interaction):
+        timeline = getattr(self.bot, 'startup', None)
+        if timeline is None or not timeline.steps:
+            return await interaction.response.send_message("❌ 시작 기록이 없습니다.", ephemeral=True)
+
+        slowest = ", ".join(f"{name} {elapsed:.2f}초" for name, _, elapsed, _ in timeline.slowest())
+        await interaction.response.send_message(
+            f"⏱️ **시작 타임라인**\n```text\n{timeline.format()}\n```\n가장 오래 걸린 단계: {slowest}",
+            ephemeral=True
+        )
+
+    # ==========================================
+    # [Command 11] 이벤트 로그 검색
+    # ==========================================
+    @app_commands.command(name="로그검색", description="[관리자] 대여/반납/잠광 기록을 유저·도구·기간으로 검색합니다.")
+    @app_commands.guild_only()
+    @app_commands.describe(
+        user="검색할 유저", category="도구 종류", name="도구 이름",
+        event="이벤트 종류", days="최근 며칠 (기본 7일, 시작 시각을 지정하면 무시)",
+        start="시작 시각 (KST, 예: 2024-05-01 또는 2024-05-01 18:00)",
+        end="끝 시각 (KST, 날짜만 쓰면 그날까지 포함)",
+        limit="최대 개수 (기본 50개)"
+    )
+    @app_commands.choices(event=[app_commands.Choice(name=label, value=key) for key, label in EVENT_LABELS.items()])
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.autocomplete(category=tool_category_autocomplete, name=tool_name_autocomplete)
+    async def search_log(self, interaction: discord.Interaction,
+                         user: discord.User = None, category: str = None, name: str = None,
+                         event: app_commands.Choice[str] = None,
+                         days: app_commands.Range[int, 1, 365] = 7,
+                         start: str = None, end: str = None,
+                         limit: app_commands.Range[int, 1, 1000] = 50):
+        # 기간: start/end를 지정하면 그 범위, 아니면 최근 days일
         try:
-            with open(filename, "w", encoding="utf-8") as f:
-                f.write("\n".join(lines))
-            await interaction.response.send_message("📂 **전체 도구 현황**입니다.", file=discord.File(filename), ephemeral=True)
-        finally:
-            if os.path.exists(filename): os.remove(filename)
+            since = parse_kst_input(start)[0] if start else clock.now() - days * 86400
+            until = None
+            if end:
+                until, date_only = parse_kst_input(end)
+                if date_only:
+                    until += 86400  # 날짜만 입력하면 그날 끝까지
+        except ValueError:
+            return await interaction.response.send_message(
+                "❌ 시각은 `2024-05-01` 또는 `2024-05-01 18:00` 형식으로 입력해 주세요.", ephemeral=True
+            )
+        if until is not None and since >= until:
+            return await interaction.response.send_message("❌ 시작 시각이 끝 시각보다 앞서야 합니다.", ephemeral=True)
+
+        await interaction.response.defer(ephemeral=True)
+
+        # 색인된 이벤트 DB 조회 (블로킹 sqlite이므로 별도 스레드)
+        rows = await asyncio.to_thread(
+            search_events, interaction.guild_id,
+            user_id=user.id if user else None, category=category, tool=name,
+            event_type=event.value if event else None,
+            since=since, until=until, limit=limit
+        )
+        if not rows:
+            return await interaction.followup.send("🔍 조건에 맞는 기록이 없습니다.")
+
+        names = await self.bot.names.resolve_many(
+            [row[2] for row in rows if row[2] is not None], default="알 수 없음", wait=3.0
+        )
+
+        lines = []
+        for ts, event_type, user_id, cat, tool, duration, message in rows:
+            when = short_kst(ts)
+            label = EVENT_LABELS.get(event_type, event_type)
+            target = f" [{cat}] {tool}" if tool else ""
+            held = f" ({format_duration(duration)})" if duration else ""
+            who = names.get(user_id, "-")
+            lines.append(f"{when} | {label} | {who}{target}{held}")
+
+        if start or end:
+            period = f"{format_kst(since, '%Y-%m-%d %H:%M')} ~ {format_kst(until, '%Y-%m-%d %H:%M') if until else '현재'}"
+        else:
+            period = f"최근 {days}일"
+        title = f"🔍 **로그 검색** ({period}, {len(rows)}건)"
+        body = "\n".join(lines)
+        if len(title) + len(body) + 20 <= 2000:
+            await interaction.followup.send(f"{title}\n```text\n{body}\n```")
+        else:
+            # 메시지 한도를 넘으면 파일로 (임시 파일 없이 메모리에서)
+            data = io.BytesIO(body.encode('utf-8'))
+            await interaction.followup.send(title, file=discord.File(data, filename="log_search.txt"))
+
+    # ==========================================
+    # [Command 12] 도구 이용 통계
+    # ==========================================
+    @app_commands.command(name="도구통계", description="[관리자] 많이 빌린 도구, 종류별 평균 대여 시간, 붐비는 시간대를 확인합니다.")
+    @app_commands.guild_only()
+    @app_commands.describe(days="최근 며칠 (기본 30일)")
+    @app_commands.default_permissions(administrator=True)
+    async def tool_stats(self, interaction: discord.Interaction, days: app_commands.Range[int, 1, 365] = 30):
+        await interaction.response.defer(ephemeral=True)
+
+        # 집계 테이블만 조회 (원본 이력을 훑지 않음)
+        guild_id = interaction.guild_id
+        since_ts = clock.now() - days * 86400
+        since_day = format_kst(since_ts)[:10]
+        top_tools = await self.bot.db.get_top_tools(guild_id, since_day, limit=10)
+        categories = await self.bot.db.get_category_hold_times(guild_id, since_day)
+        hours = await self.bot.db.get_hourly_borrows(guild_id, since_ts)
+
+        if not top_tools:
+            return await interaction.followup.send(f"📊 최근 {days}일 동안 대여 기록이 없습니다.")
+
+        embed = discord.Embed(title=f"📊 도구 이용 통계 (최근 {days}일)", color=discord.Color.blue())
+
+        embed.add_field(
+            name="🏆 많이 빌린 도구",
+            value="\n".join(f"{rank}. [{cat}] {name} - {count}회" for rank, (cat, name, count) in enumerate(top_tools, start=1)),
+            inline=False
+        )
+
+        hold_lines = []
+        for cat, borrows, returns, hold_seconds in categories:
+            average = format_duration(hold_seconds / returns) if returns else "-"
+            hold_lines.append(f"[{cat}] 평균 {average} (대여 {borrows}회, 반납 {returns}회)")
+        embed.add_field(name="⏱️ 종류별 평균 대여 시간", value="\n".join(hold_lines)[:1024] or "-", inline=False)
+
+        busiest = sorted(hours, key=lambda row: row[1], reverse=True)[:3]
+        embed.add_field(
+            name="🕘 붐비는 시간대 (KST)",
+            value=", ".join(f"{hour}시 ({count}회)" for hour, count in busiest if count) or "-",
+            inline=False
+        )
+        await interaction.followup.send(embed=embed)
 
 async def setup(bot):
     await bot.add_cog(Admin(bot))
\ No newline at end of file
@@ -1,9 +1,26 @@
 import discord
 from discord import app_commands
-from discord.ext import commands, tasks
-import datetime
-import pytz
-from modules.logger import bot_logger
+from discord.ext import commands
+import asyncio
+import functools
+import hashlib
+import json
+import time
+from modules.logger import bot_logger, log_event
+from modules.database import LEGACY_GUILD_ID
+from modules import clock
+from modules.clock import format_kst
+from modules.mining_state import MiningStates
+
+# 알림 발송 실패 시 재시도 간격(초)
+ALERT_RETRY_SECONDS = 60
+
+def mining_event(event_type, guild_id, user_id=None, started_at=None):
+    """/로그검색용 잠광 이벤트 (started_at이 있으면 진행 시간 포함)"""
+    return {
+        'type': event_type, 'guild_id': guild_id, 'user_id': user_id,
+        'duration': clock.now() - started_at if started_at else None
+    }
 
 # ==========================================
 # [UI View 1] 알림 메시지용 버튼 (일회성)
@@ -18,27 +35,26 @@ class ClearMiningView(discord.ui.View):
     async def clear_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
 
-        # DB 업데이트
-        now = self.bot.db.get_korea_time()
-        await self.bot.db.update_mining_last_cleared(now, interaction.user.id)
-        
+        mining_cog = self.bot.get_cog("Mining")
+        if not mining_cog:
+            return
+
+        # 상태 + DB 업데이트 (alert 상태도 함께 초기화됨)
+        state = mining_cog.states.get(interaction.guild_id)
+        await state.clear(interaction.user.id)
+        state.alert_message = None  # 참조 해제 (이미 이 메시지가 alert_message)
+
         # 로그
         user_nick = await self.bot.db.get_user_nickname(interaction.user.id) or interaction.user.display_name
-        bot_logger.info(f"[+] [Mining] 알림 버튼으로 비움 완료: {user_nick}")
+        log_event(f"[+] [Mining] 알림 버튼으로 비움 완료: {user_nick}", mining_event('mining_clear', interaction.guild_id, interaction.user.id))
 
         # 버튼 비활성화
         button.disabled = True
         button.label = f"비움 완료 ({user_nick})"
         await interaction.followup.edit_message(message_id=interaction.message.id, view=self)
 
-        # alert 상태 초기화
-        mining_cog = self.bot.get_cog("Mining")
-        if mining_cog:
-            mining_cog.alert_sent = False
-            mining_cog.alert_message = None  # 참조 해제 (이미 이 메시지가 alert_message)
-
         # 알림 메시지 삭제 예약
-        await interaction.message.delete(delay=300) 
+        await interaction.message.delete(delay=300)
 
         # 대시보드 갱신
         await self.update_dashboard()
@@ -57,25 +73,18 @@ class DashboardView(discord.ui.View):
     async def dash_start_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
 
-        # 추가 전 현재 인원 확인 (0명→1명 전환 감지용)
-        users_before = await self.bot.db.get_all_mining_users()
- 
-        if await self.bot.db.add_mining_user(interaction.user.id):
-            bot_logger.info(f"[+] [Mining] 대시보드 시작: {interaction.user.name}")
-
-            # 잠광 인원이 없다가 처음 시작된 경우 → 타이머를 지금 시점으로 리셋
-            if len(users_before) == 0:
-                now = self.bot.db.get_korea_time()
-                await self.bot.db.update_mining_last_cleared(now, None)
-                bot_logger.info(f"[i] [Mining] 시작, last_cleared 리셋: {now}")
-
-            cog = self.bot.get_cog("Mining")
-
-            if cog:
-                if len(users_before) == 0:
-                    cog.alert_sent = False
-                await cog.update_dashboard()
-            
+        cog = self.bot.get_cog("Mining")
+        if not cog: return
+        state = cog.states.get(interaction.guild_id)
+
+        # 잠광 인원이 없다가 처음 시작된 경우의 타이머 리셋은 MiningState.start에서 처리
+        added, was_empty = await state.start(interaction.user.id)
+        if added:
+            log_event(f"[+] [Mining] 대시보드 시작: {interaction.user.name}", mining_event('mining_start', state.guild_id, interaction.user.id))
+            if was_empty:
+                bot_logger.info(f"[i] [Mining] 시작, last_cleared 리셋: {format_kst(state.last_cleared_at)}")
+
+            await cog.update_dashboard(state.guild_id)
             await interaction.followup.send("⛏️ 잠광 시작이 기록되었습니다!", ephemeral=True)
         else:
             await interaction.followup.send("👀 이미 진행 중으로 등록되어 있습니다.", ephemeral=True)
@@ -83,22 +92,19 @@ class DashboardView(discord.ui.View):
     @discord.ui.button(label="잠광 종료", style=discord.ButtonStyle.danger, emoji="👋", custom_id="mining_dash_end_btn", row=0)
     async def dash_end_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
-        if await self.bot.db.remove_mining_user(interaction.user.id):
-            bot_logger.info(f"[-] [Mining] 대시보드 종료: {interaction.user.name}")
-
-            users_after = await self.bot.db.get_all_mining_users()
-            cog = self.bot.get_cog("Mining")
-
-            if not users_after and cog:  # 마지막 인원이 나가면 알림 메시지 삭제
-                cog.alert_sent = False
-                if cog.alert_message:
-                    try:
-                        await cog.alert_message.delete()
-                    except Exception:
-                        pass
-                    cog.alert_message = None
-            
-            if cog: await cog.update_dashboard()
+
+        cog = self.bot.get_cog("Mining")
+        if not cog: return
+        state = cog.states.get(interaction.guild_id)
+
+        started_at = state.miners.get(interaction.user.id)
+        if await state.end(interaction.user.id):
+            log_event(f"[-] [Mining] 대시보드 종료: {interaction.user.name}", mining_event('mining_end', state.guild_id, interaction.user.id, started_at))
+
+            if not state.miners:  # 마지막 인원이 나가면 알림 메시지 삭제
+                await cog.reset_alert(state)
+
+            await cog.update_dashboard(state.guild_id)
             await interaction.followup.send("👋 수고하셨습니다! 종료 처리되었습니다.", ephemeral=True)
         else:
             await interaction.followup.send("❌ 진행 중인 잠광 기록이 없습니다.", ephemeral=True)
@@ -108,142 +114,221 @@ class DashboardView(discord.ui.View):
         # 권한 체크 (현재는 모두 허용)
         await interaction.response.defer()
 
-        # DB 업데이트
-        now = self.bot.db.get_korea_time()
-        await self.bot.db.update_mining_last_cleared(now, interaction.user.id)
-        
+        cog = self.bot.get_cog("Mining")
+        if not cog: return
+        state = cog.states.get(interaction.guild_id)
+
+        # 상태 + DB 업데이트
+        await state.clear(interaction.user.id)
+
         user_nick = await self.bot.db.get_user_nickname(interaction.user.id) or interaction.user.display_name
-        bot_logger.info(f"[+] [Mining] 대시보드에서 비움/리셋: {user_nick}")
+        log_event(f"[+] [Mining] 대시보드에서 비움/리셋: {user_nick}", mining_event('mining_clear', state.guild_id, interaction.user.id))
+
+        # 알림 메시지 삭제 + 대시보드 즉시 갱신
+        await cog.reset_alert(state)
+        await cog.update_dashboard(state.guild_id)
 
-        # 대시보드 즉시 갱신
-        cog = self.bot.get_cog("Mining")
-        if cog:
-            cog.alert_sent = False
-            if cog.alert_message:
-                try:
-                    await cog.alert_message.delete()
-                except Exception:
-                    pass
-                cog.alert_message = None
-            await cog.update_dashboard()
-        
         await interaction.followup.send("✅ 상자 비움 처리 완료! 타이머가 0분으로 초기화되었습니다.", ephemeral=True)
 
     @discord.ui.button(label="다 거짓말쟁이들이야!!! (전체 종료)", style=discord.ButtonStyle.danger, emoji="😭", custom_id="mining_dash_end_all_btn", row=2)
     async def dash_end_all_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
- 
-        users = await self.bot.db.get_all_mining_users()
-        if not users:
+
+        cog = self.bot.get_cog("Mining")
+        if not cog: return
+        state = cog.states.get(interaction.guild_id)
+
+        if not state.miners:
             await interaction.followup.send("❌ 현재 잠광 중인 인원이 없습니다.", ephemeral=True)
             return
- 
-        count = len(users)
-        await self.bot.db.remove_all_mining_users()
- 
-        bot_logger.info(f"[!] [Mining] 전체 종료: {count}명 by {interaction.user.name}")
-
-        dm_results = []
-        for uid, _ in users:
+
+        started = dict(state.miners)
+        user_ids = await state.end_all()
+        count = len(user_ids)
+
+        log_event(
+            f"[!] [Mining] 전체 종료: {count}명 by {interaction.user.name}",
+            [mining_event('mining_end', state.guild_id, uid, started.get(uid)) for uid in user_ids]
+        )
+
+        async def send_dm(uid, target_user):
+            if target_user is None:
+                return f"❓ {uid} (DM 실패)"
             try:
-                target_user = self.bot.get_user(uid) or await self.bot.fetch_user(uid)
                 embed = discord.Embed(
                     title="거짓말쟁이!!!!!!",
                     description="잠광이 **전체 종료** 처리되었습니다.\n**다음부터는 잊지 말고 직접 종료해 주세요!**",
                     color=discord.Color.orange()
                 )
                 await target_user.send(embed=embed)
-                dm_results.append(f"✅ {target_user.display_name}")
+                return f"✅ {target_user.display_name}"
             except discord.Forbidden:
-                dm_results.append(f"🚫 {uid} (DM 차단)")
+                return f"🚫 {uid} (DM 차단)"
             except Exception:
-                dm_results.append(f"❓ {uid} (DM 실패)")
- 
+                return f"❓ {uid} (DM 실패)"
+
+        # 유저 조회와 DM 발송을 순차 대기 없이 동시에 처리 (동시 실행 수는 NameResolver가 제한)
+        targets = await self.bot.names.fetch_users(user_ids)
+        dm_results = await asyncio.gather(*(send_dm(uid, u) for uid, u in targets.items()))
+        dm_failed = [result for result in dm_results if not result.startswith("✅")]
+        if dm_failed:
+            bot_logger.warning(f"[!] [Mining] 전체 종료 DM 실패 {len(dm_failed)}명: {', '.join(dm_failed)}")
+
         # 알림 메시지 삭제 및 상태 초기화
-        cog = self.bot.get_cog("Mining")
-        if cog:
-            cog.alert_sent = False
-            if cog.alert_message:
-                try:
-                    await cog.alert_message.delete()
-                except Exception:
-                    pass
-                cog.alert_message = None
-            await cog.update_dashboard()
- 
+        await cog.reset_alert(state)
+        await cog.update_dashboard(state.guild_id)
+
         await interaction.followup.send(f"🛑 잠광 중인 **{count}명** 전원 종료 처리가 완료되었습니다.", ephemeral=True)
 
 
+# ==========================================
+# [Helper] 대시보드 갱신 스케줄러
+# ==========================================
+class DashboardRenderer:
+    """대시보드 갱신 요청을 모아서 처리하는 스케줄러
+
+    첫 요청은 바로 그리고, 그 뒤 window초 동안 들어온 요청은 모두 합쳐
+    한 번만 다시 그립니다. (여러 명이 동시에 버튼을 눌러도 수정은 주기당 1회)
+    """
+
+    def __init__(self, render, window=2.0):
+        self._render = render  # 실제 그리기 코루틴 함수
+        self.window = window
+        self._dirty = False
+        self._task = None
+
+    def request(self):
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self._dirty:
+            self._dirty = False
+            try:
+                await self._render()
+            except Exception as e:
+                bot_logger.error(f"[-] [Mining] 대시보드 갱신 실패: {e}")
+            # 이 동안 들어온 요청은 다음 한 번으로 합쳐짐
+            await asyncio.sleep(self.window)
+
+    def cancel(self):
+        """대기 중인 갱신 취소 -> 취소한 Task (없으면 None)"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+        return task
+
+
 # ==========================================
 # [Cog] 잠광 매니저
 # ==========================================
 class Mining(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.alert_sent = False
-        self.alert_message = None
-        self.check_mining_timer.start()
+
+        # 길드별 잠광 상태 메모리 원본 (설정/인원/마지막 비움/알림 상태)
+        self.states = MiningStates(bot.db)
+
+        # 길드별 대시보드 갱신 요청 합치기 + 메시지 객체/내용 해시 캐시 (불필요한 fetch/edit 방지)
+        self.options = bot.config.get('mining', {})
+        self.dashboards = {}         # { guild_id: DashboardRenderer }
+        self._dashboard_msgs = {}    # { guild_id: Message }
+        self._dashboard_hashes = {}  # { guild_id: 내용 해시 }
+
+        self._alert_task = None
+        self._alert_retry_at = {}    # { guild_id: 알림 재시도 시각 }
+
+    async def cog_load(self):
+        """Cog 로드 시 모든 길드의 잠광 상태를 DB에서 한 번만 불러옴"""
+        await self.states.load()
+        self._alert_task = asyncio.create_task(self.alert_scheduler())
+        self._alert_task.add_done_callback(self._on_alert_task_done)
+        bot_logger.info(f"[+] [Mining] 잠광 상태 로드 완료 (길드 {len(self.states)}개, 진행 인원 {self.states.miner_count}명)")
+
+    def _on_alert_task_done(self, task):
+        """알림 스케줄러가 예외로 끝나면 기록 (지켜보는 곳이 없어 그대로 두면 조용히 멈춤)"""
+        if not task.cancelled() and task.exception() is not None:
+            bot_logger.error(f"[-] [Mining] 알림 스케줄러가 예외로 종료되었습니다: {task.exception()!r}")
 
     async def cog_unload(self):
-        self.check_mining_timer.cancel()
+        """알림 스케줄러/대시보드 갱신 중지 (실행 중이던 작업이 끝날 때까지 대기)"""
+        running = [renderer.cancel() for renderer in self.dashboards.values()]
+        if self._alert_task is not None:
+            self._alert_task.cancel()
+            running.append(self._alert_task)
+        await asyncio.gather(*(task for task in running if task is not None), return_exceptions=True)
+
+    async def reset_alert(self, state):
+        """알림 상태 초기화 + 남아있는 알림 메시지 삭제"""
+        if state.alert_sent:
+            state.alert_sent = False
+            state.notify()
+        alert_message, state.alert_message = state.alert_message, None
+        if alert_message:
+            try:
+                await alert_message.delete()
+            except Exception:
+                pass
 
     # ==========================================
     # [Helper] 대시보드(현황판) 업데이트 로직
     # ==========================================
-    async def update_dashboard(self):
+    async def update_dashboard(self, guild_id):
+        """대시보드 갱신 예약 (짧은 시간 내의 요청은 한 번의 수정으로 합쳐짐)"""
+        renderer = self.dashboards.get(guild_id)
+        if renderer is None:
+            renderer = DashboardRenderer(
+                functools.partial(self._render_dashboard, guild_id),
+                self.options.get('dashboard_window', 2.0)
+            )
+            self.dashboards[guild_id] = renderer
+        renderer.request()
+
+    async def _render_dashboard(self, guild_id):
         """잠광 현황 메시지를 갱신하거나 새로 보냅니다."""
-        config = await self.bot.db.get_mining_config() 
-        if not config: return
+        if guild_id not in self.states: return
+        state = self.states.get(guild_id)
+        if not state.configured: return
 
-        channel_id, _, last_cleared, msg_id, last_cleared_user_id = config
+        channel_id, msg_id = state.channel_id, state.dashboard_msg_id
         channel = self.bot.get_channel(channel_id)
         if not channel: return
 
-        users = await self.bot.db.get_all_mining_users()
-        
+        miners = list(state.miners.items())
+        last_cleared_user_id = state.last_cleared_user_id
+
+        # 표시할 유저들의 이름을 한 번에 조회
+        # (REST 조회가 필요한 유저는 임시 이름으로 먼저 그리고, 조회가 끝나면 다시 갱신)
+        name_ids = [uid for uid, _ in miners]
+        if last_cleared_user_id:
+            name_ids.append(last_cleared_user_id)
+        names = await self.bot.names.resolve_many(
+            name_ids, on_update=functools.partial(self.update_dashboard, guild_id)
+        )
+
         # Embed 구성
         embed = discord.Embed(title="💸 잠광 현황판", color=discord.Color.gold())
-        kst = pytz.timezone('Asia/Seoul')
-        
-        if last_cleared:
-            dt = datetime.datetime.strptime(last_cleared, '%Y-%m-%d %H:%M:%S')
-            dt = kst.localize(dt) 
-            timestamp = int(dt.timestamp())
+
+        if state.last_cleared_at:
+            timestamp = state.last_cleared_at
 
             clear_user_nick = "알 수 없음"
             if last_cleared_user_id:
-                clear_user_nick = await self.bot.db.get_user_nickname(last_cleared_user_id)
-                if not clear_user_nick:
-                    try:
-                        u_obj = self.bot.get_user(last_cleared_user_id) or await self.bot.fetch_user(last_cleared_user_id)
-                        clear_user_nick = u_obj.display_name
-                    except Exception:
-                        clear_user_nick = f"ID:{last_cleared_user_id}"
+                clear_user_nick = names[last_cleared_user_id]
 
             time_field = f"<t:{timestamp}:T> (<t:{timestamp}:R>) - 마지막 비움: **{clear_user_nick}**님"
         else:
             time_field = "기록 없음"
-            
+
         embed.add_field(name="🗑️ 마지막 비움", value=time_field, inline=False)
 
-        if users:
+        if miners:
             user_lines = []
-            for uid, start_time in users:
-                nick = await self.bot.db.get_user_nickname(uid)
-                if not nick:
-                    try:
-                        u_obj = self.bot.get_user(uid) or await self.bot.fetch_user(uid)
-                        nick = u_obj.display_name
-                    except:
-                        nick = "Unknown"
-                
-                s_dt = datetime.datetime.strptime(start_time, '%Y-%m-%d %H:%M:%S')
-                s_dt = kst.localize(s_dt)
-                s_ts = int(s_dt.timestamp())
-                
-                user_lines.append(f"👤 **{nick}** (~<t:{s_ts}:R>)")
-            
-            embed.add_field(name=f"🌕 잠광 인원 ({len(users)}명)", value="\n".join(user_lines), inline=False)
+            for uid, s_ts in miners:
+                user_lines.append(f"👤 **{names[uid]}** (~<t:{s_ts}:R>)")
+
+            embed.add_field(name=f"🌕 잠광 인원 ({len(miners)}명)", value="\n".join(user_lines), inline=False)
             embed.set_footer(text="상자 비움 알림은 1시간 50분마다 발송됩니다.")
             embed.color = discord.Color.green()
         else:
@@ -251,139 +336,211 @@ class Mining(commands.Cog):
             embed.set_footer(text="/잠광시작 명령어 혹은 버튼 상호작용을 통해 등록해주세요.")
             embed.color = discord.Color.light_grey()
 
+        # 내용이 이전과 같으면 수정 생략
+        content_hash = hashlib.sha1(
+            json.dumps(embed.to_dict(), sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+
+        dashboard_msg = self._dashboard_msgs.get(guild_id)
+        if dashboard_msg is not None and (dashboard_msg.id != msg_id or dashboard_msg.channel.id != channel_id):
+            dashboard_msg = None  # 설정이 바뀌었으면 캐시 폐기
+
+        if dashboard_msg is not None and content_hash == self._dashboard_hashes.get(guild_id):
+            return
+
         # 대시보드용 버튼 뷰 생성
         view = DashboardView(self.bot)
 
-        # 메시지 전송/수정 로직
-        dashboard_msg = None
-        
-        if msg_id:
+        # 메시지 전송/수정 로직 (fetch 없이 캐시된/부분 메시지 객체로 바로 수정)
+        if dashboard_msg is None and msg_id:
+            dashboard_msg = channel.get_partial_message(msg_id)
+
+        if dashboard_msg is not None:
             try:
-                dashboard_msg = await channel.fetch_message(msg_id)
                 # 메시지 내용과 함께 view(버튼)도 업데이트
-                await dashboard_msg.edit(embed=embed, view=view)
+                dashboard_msg = await dashboard_msg.edit(embed=embed, view=view)
             except discord.NotFound:
                 dashboard_msg = None
-        
+
         if dashboard_msg is None:
-            new_msg = await channel.send(embed=embed, view=view)
-            await self.bot.db.update_mining_dashboard_id(new_msg.id)
+            dashboard_msg = await channel.send(embed=embed, view=view)
+            await state.set_dashboard_id(dashboard_msg.id)
+
+        self._dashboard_msgs[guild_id] = dashboard_msg
+        self._dashboard_hashes[guild_id] = content_hash
+
+    def _forget_dashboard(self, guild_id):
+        """캐시된 대시보드 메시지/내용 해시 폐기 (다음 갱신 때 내용과 상관없이 수정 또는 재전송)"""
+        self._dashboard_msgs.pop(guild_id, None)
+        self._dashboard_hashes.pop(guild_id, None)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        """대시보드 메시지가 삭제되면 캐시를 비워 다음 갱신 때 새로 보내도록 함"""
+        if payload.guild_id in self.states and payload.message_id == self.states.get(payload.guild_id).dashboard_msg_id:
+            self._forget_dashboard(payload.guild_id)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload):
+        if payload.guild_id in self.states and self.states.get(payload.guild_id).dashboard_msg_id in payload.message_ids:
+            self._forget_dashboard(payload.guild_id)
 
     # ==========================================
-    # [Task] 1분 주기 타이머 체크
+    # [Task] 상자 비움 알림 스케줄러 (모든 길드를 하나의 태스크로)
     # ==========================================
-    @tasks.loop(minutes=1)
-    async def check_mining_timer(self):
-        config = await self.bot.db.get_mining_config()
-        if not config: return
-        channel_id, role_id, last_cleared, msg_id, last_cleared_user_id = config
-
-        if not last_cleared or not channel_id: return
-
-        users = await self.bot.db.get_all_mining_users()
-        
-        if not users:
-            # 인원이 없으면 알림 상태 초기화 + 남은 알림 메시지 삭제
-
-            if self.alert_sent or self.alert_message:
-                self.alert_sent = False
-                if self.alert_message:
-                    try:
-                        await self.alert_message.delete()
-                    except Exception:
-                        pass
-                    self.alert_message = None
+    async def alert_scheduler(self):
+        """가장 가까운 알림 시각까지 잠들었다가 그 시각이 된 길드에 알림 발송
+
+        한 번 깨어날 때 이 프로세스(샤드)가 담당하는 길드의 알림 시각을 메모리에서 한 번에 훑어
+        도래한 길드는 알림을 보내고, 나머지 중 가장 이른 시각까지 다시 잠듭니다.
+        진행 인원이 있는 길드가 없으면 상태 변경이 있을 때까지 완전히 대기하고,
+        어느 길드든 시작/종료/비움/강제비움시간 등으로 상태가 바뀌면 다시 계산합니다.
+        """
+        await self.bot.wait_until_ready()
+        try:
+            await self._adopt_legacy_state()
+        except Exception as e:
+            # 이전 실패가 알림 전체를 멈추지 않도록 기록만 하고 계속 진행 (다음 시작 시 재시도)
+            bot_logger.error(f"[-] [Mining] 단일 서버 잠광 데이터 이전 중 예외 발생: {e}")
+        changed = self.states.changed
+
+        while True:
+            changed.clear()
+            now = time.time()
+            next_at = None
+
+            for state in self.states:
+                deadline = state.alert_deadline()
+                if deadline is None or not self.bot.owns_guild(state.guild_id):
+                    continue
+                deadline = max(deadline, self._alert_retry_at.get(state.guild_id, 0))
+
+                if deadline > now:
+                    next_at = deadline if next_at is None else min(next_at, deadline)
+                    continue
+
+                try:
+                    sent = await self.send_alert(state)
+                except Exception as e:
+                    bot_logger.error(f"[-] [Mining] 알림 스케줄러 작동 중 예외 발생 (길드 {state.guild_id}): {e}")
+                    sent = False
+
+                if sent:
+                    self._alert_retry_at.pop(state.guild_id, None)
+                else:
+                    # 채널을 못 찾았거나 전송 실패 -> 잠시 후 재시도 (상태가 바뀌면 즉시 재계산)
+                    retry_at = now + ALERT_RETRY_SECONDS
+                    self._alert_retry_at[state.guild_id] = retry_at
+                    next_at = retry_at if next_at is None else min(next_at, retry_at)
+
+            if changed.is_set():
+                continue  # 알림을 보내는 동안 상태가 바뀌었으면 바로 다시 계산
+
+            try:
+                if next_at is None:
+                    await changed.wait()
+                else:
+                    await asyncio.wait_for(changed.wait(), timeout=max(next_at - time.time(), 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def send_alert(self, state):
+        """상자 비움 알림 발송 -> 발송 여부"""
+        channel = self.bot.get_channel(state.channel_id)
+        if not channel:
+            return False
+
+        role_mention = f"<@&{state.role_id}>" if state.role_id else "@here"
+
+        # 혹시 이전 알림 메시지가 남아있다면 삭제 (다중 알림 방지)
+        await self.reset_alert(state)
+
+        # 알림 메시지용 뷰 (DashboardView가 아님)
+        view = ClearMiningView(self.bot, functools.partial(self.update_dashboard, state.guild_id))
+        state.alert_message = await channel.send(
+            f"🚨 {role_mention} **상자 비움 알림**\n잠광 시작 후 1시간 50분이 경과했습니다! 상자를 비워주세요.",
+            view=view
+        )
+
+        log_event(
+            f"[+] [Mining] 시간 경과 알림 발송 (길드 {state.guild_id}, {int(state.minutes_since_clear())}분 경과)",
+            mining_event('mining_alert', state.guild_id, started_at=state.last_cleared_at)
+        )
+        state.alert_sent = True
+        return True
+
+    async def _adopt_legacy_state(self):
+        """단일 서버 시절 잠광 데이터를 실제 길드로 이전
+
+        길드 결정 순서: config.json의 legacy_guild_id -> 설정된 알림 채널의 길드 -> 봇이 속한 유일한 길드 (샤딩 미사용 시)
+        """
+        if LEGACY_GUILD_ID not in self.states:
             return
+        legacy = self.states.get(LEGACY_GUILD_ID)
 
-        kst = pytz.timezone('Asia/Seoul')
-        now = datetime.datetime.now(kst)
-        
-        last = datetime.datetime.strptime(last_cleared, '%Y-%m-%d %H:%M:%S')
-        last = kst.localize(last) 
-        
-        diff = now - last
-        minutes_diff = diff.total_seconds() / 60
-
-        # 110분 = 1시간 50분
-        if minutes_diff >= 110:
-            if not self.alert_sent:
-                channel = self.bot.get_channel(channel_id)
-                if channel:
-                    role_mention = f"<@&{role_id}>" if role_id else "@here"
-                    
-                    # 혹시 이전 알림 메시지가 남아있다면 삭제 (다중 알림 방지)
-                    if self.alert_message:
-                        try:
-                            await self.alert_message.delete()
-                        except Exception:
-                            pass
-
-                    # 알림 메시지용 뷰 (DashboardView가 아님)
-                    view = ClearMiningView(self.bot, self.update_dashboard)
-                    self.alert_message = await channel.send(
-                        f"🚨 {role_mention} **상자 비움 알림**\n잠광 시작 후 1시간 50분이 경과했습니다! 상자를 비워주세요.",
-                        view=view
-                    )
-                    
-                    bot_logger.info(f"[+] [Mining] 시간 경과 알림 발송 ({int(minutes_diff)}분 경과)")
-                    self.alert_sent = True
-        else:
-            if self.alert_sent:
-                self.alert_sent = False
+        guild_id = self.bot.config.get('legacy_guild_id')
+        if not guild_id and legacy.channel_id:
+            channel = self.bot.get_channel(legacy.channel_id)
+            guild_id = getattr(getattr(channel, 'guild', None), 'id', None)
+        if not guild_id and (self.bot.shard_count or 1) == 1 and len(self.bot.guilds) == 1:
+            guild_id = self.bot.guilds[0].id
 
-    @check_mining_timer.before_loop
-    async def before_timer(self):
-        await self.bot.wait_until_ready()
+        if guild_id and not self.bot.owns_guild(guild_id):
+            return  # 다른 샤드 프로세스가 이전
+
+        if not guild_id:
+            bot_logger.warning("[!] [Mining] 이전 잠광 데이터의 길드를 찾지 못했습니다. (config.json의 legacy_guild_id 설정 필요)")
+            return
 
-    @check_mining_timer.error
-    async def timer_error(self, error):
-        bot_logger.error(f"[-] [Mining] 백그라운드 타이머 작동 중 예외 발생: {error}")
+        if await self.states.adopt_legacy(guild_id):
+            bot_logger.info(f"[+] [Mining] 이전 잠광 데이터를 길드 {guild_id}로 이전 완료")
+            await self.update_dashboard(guild_id)
+        else:
+            bot_logger.warning(f"[!] [Mining] 길드 {guild_id}에 이미 잠광 데이터가 있어 이전 데이터를 이전하지 않았습니다.")
 
     # ==========================================
     # [Command 1] 설정 (관리자)
     # ==========================================
     @app_commands.command(name="잠광설정", description="[관리자] 잠광 알림 채널과 역할을 설정합니다.")
+    @app_commands.guild_only()
     @app_commands.describe(channel="알림을 보낼 채널", role="호출할 역할 (비우면 @here로 설정)")
     @app_commands.default_permissions(administrator=True)
     async def set_config(self, interaction: discord.Interaction, channel: discord.TextChannel, role: discord.Role = None):
         role_id = role.id if role else None
+        state = self.states.get(interaction.guild_id)
 
-        await self.bot.db.set_mining_config(channel.id, role_id)
-        
-        now = self.bot.db.get_korea_time()
-        await self.bot.db.update_mining_last_cleared(now)
+        # 설정 저장 + 설정 시점부터 타이머 시작
+        await state.configure(channel.id, role_id)
 
         role_name = role.name if role else "@here (전체)"
         role_mention = role.mention if role else "@here"
-        
+
         bot_logger.info(f"[+] [Mining] 설정 변경: 채널({channel.name}), 역할({role_name})")
         await interaction.response.send_message(f"✅ 설정 완료!\n채널: {channel.mention}\n역할: {role_mention}", ephemeral=True)
-        
-        # 5. 대시보드 갱신
-        await self.update_dashboard()
+
+        # 5. 대시보드 갱신 (내용이 같아도 메시지가 남아있는지 다시 확인)
+        self._forget_dashboard(interaction.guild_id)
+        await self.update_dashboard(interaction.guild_id)
 
     # ==========================================
     # [Command 2] 잠광 시작
     # ==========================================
     @app_commands.command(name="잠광시작", description="잠수 광질을 시작합니다.")
+    @app_commands.guild_only()
     async def start_mining(self, interaction: discord.Interaction):
-        config = await self.bot.db.get_mining_config()
-        if config and interaction.channel_id != config[0]:
+        state = self.states.get(interaction.guild_id)
+        if state.configured and interaction.channel_id != state.channel_id:
             return await interaction.response.send_message("❌ 잠광 채널에서만 사용할 수 있습니다.", ephemeral=True)
-        
-        users_before = await self.bot.db.get_all_mining_users()
 
-        if await self.bot.db.add_mining_user(interaction.user.id):
-            bot_logger.info(f"[+] [Mining] 시작: {interaction.user.name}")
+        added, was_empty = await state.start(interaction.user.id)
+        if added:
+            log_event(f"[+] [Mining] 시작: {interaction.user.name}", mining_event('mining_start', state.guild_id, interaction.user.id))
 
-            if len(users_before) == 0:  # 0명 → 1명 전환이면 타이머 리셋
-                now = self.bot.db.get_korea_time()
-                await self.bot.db.update_mining_last_cleared(now, None)
-                self.alert_sent = False
-                bot_logger.info(f"[i] [Mining] 인원 0→1 전환, last_cleared 리셋: {now}")
+            if was_empty:  # 0명 → 1명 전환이면 타이머 리셋됨
+                bot_logger.info(f"[i] [Mining] 인원 0→1 전환, last_cleared 리셋: {format_kst(state.last_cleared_at)}")
 
             await interaction.response.send_message("⛏️ 잠광 시작이 기록되었습니다!", ephemeral=True)
-            await self.update_dashboard()
+            await self.update_dashboard(interaction.guild_id)
         else:
             await interaction.response.send_message("👀 이미 진행 중으로 등록되어 있습니다.", ephemeral=True)
 
@@ -391,26 +548,20 @@ class Mining(commands.Cog):
     # [Command 3] 잠광 종료
     # ==========================================
     @app_commands.command(name="잠광종료", description="잠수 광질을 종료합니다.")
+    @app_commands.guild_only()
     async def end_mining(self, interaction: discord.Interaction):
-        if await self.bot.db.remove_mining_user(interaction.user.id):
-            bot_logger.info(f"[-] [Mining] 종료: {interaction.user.name}")
-            
-            users = await self.bot.db.get_all_mining_users()
-            remain_msg = f"(남은 인원: {len(users)}명)" if users else "(모두 종료됨)"
-            
-            cog = self.bot.get_cog("Mining")
-
-            if not users:  # 마지막 인원이 나가면 알림 메시지 삭제
-                if cog:
-                    cog.alert_sent = False
-                    if cog.alert_message:
-                        try:
-                            await cog.alert_message.delete()
-                        except Exception:
-                            pass
-                        cog.alert_message = None
-
-            await cog.update_dashboard()
+        state = self.states.get(interaction.guild_id)
+        started_at = state.miners.get(interaction.user.id)
+        if await state.end(interaction.user.id):
+            log_event(f"[-] [Mining] 종료: {interaction.user.name}", mining_event('mining_end', state.guild_id, interaction.user.id, started_at))
+
+            remaining = len(state.miners)
+            remain_msg = f"(남은 인원: {remaining}명)" if remaining else "(모두 종료됨)"
+
+            if not remaining:  # 마지막 인원이 나가면 알림 메시지 삭제
+                await self.reset_alert(state)
+
+            await self.update_dashboard(interaction.guild_id)
             await interaction.response.send_message(f"👋 수고하셨습니다! {remain_msg}", ephemeral=True)
         else:
             await interaction.response.send_message("❌ 진행 중인 잠광 기록이 없습니다.", ephemeral=True)
@@ -419,6 +570,7 @@ class Mining(commands.Cog):
     # [Command 4] 강제 조작 (관리자)
     # ==========================================
     @app_commands.command(name="강제잠광", description="[관리자] 유저의 잠광 상태를 강제로 변경합니다.")
+    @app_commands.guild_only()
     @app_commands.choices(action=[
         app_commands.Choice(name="시작처리", value="start"),
         app_commands.Choice(name="종료처리", value="end")
@@ -426,7 +578,8 @@ class Mining(commands.Cog):
     @app_commands.default_permissions(administrator=True)
     async def force_mining(self, interaction: discord.Interaction, action: str, user: discord.User):
         await interaction.response.defer(ephemeral=True)
-        
+        state = self.states.get(interaction.guild_id)
+
         async def send_dm_warning(target_user, act_str):
             try:
                 embed = discord.Embed(
@@ -443,71 +596,59 @@ class Mining(commands.Cog):
 
         if action == "start":
 
-            users_before = await self.bot.db.get_all_mining_users()
+            added, was_empty = await state.start(user.id)
 
-            if await self.bot.db.add_mining_user(user.id):
+            if added:
 
-                if len(users_before) == 0:  # 0→1 전환 시 타이머 리셋
-                    now = self.bot.db.get_korea_time()
-                    await self.bot.db.update_mining_last_cleared(now, None)
-                    self.alert_sent = False
-                    bot_logger.info(f"[i] [Mining] 인원 0→1 전환(강제시작), last_cleared 리셋: {now}")
+                if was_empty:  # 0→1 전환 시 타이머 리셋됨
+                    bot_logger.info(f"[i] [Mining] 인원 0→1 전환(강제시작), last_cleared 리셋: {format_kst(state.last_cleared_at)}")
 
                 dm_result = await send_dm_warning(user, "시작")
                 await interaction.followup.send(f"✅ **{user.display_name}**님을 시작 상태로 등록했습니다. ({dm_result})")
-                bot_logger.info(f"[+] [Mining] 강제시작: {user.name} by {interaction.user.name}")
+                log_event(f"[+] [Mining] 강제시작: {user.name} by {interaction.user.name}", mining_event('mining_start', state.guild_id, user.id))
             else:
                 await interaction.followup.send(f"⚠️ **{user.display_name}**님은 이미 진행 중입니다.")
-        
-        else: 
-            if await self.bot.db.remove_mining_user(user.id):
 
-                users_after = await self.bot.db.get_all_mining_users()
+        else:
+            started_at = state.miners.get(user.id)
+            if await state.end(user.id):
 
-                if not users_after:  # 마지막 인원이면 알림 메시지 삭제
-                    self.alert_sent = False
-                    if self.alert_message:
-                        try:
-                            await self.alert_message.delete()
-                        except Exception:
-                            pass
-                        self.alert_message = None
+                if not state.miners:  # 마지막 인원이면 알림 메시지 삭제
+                    await self.reset_alert(state)
 
                 dm_result = await send_dm_warning(user, "종료")
                 await interaction.followup.send(f"✅ **{user.display_name}**님을 종료 처리했습니다. ({dm_result})")
-                bot_logger.info(f"[-] [Mining] 강제종료: {user.name} by {interaction.user.name}")
+                log_event(f"[-] [Mining] 강제종료: {user.name} by {interaction.user.name}", mining_event('mining_end', state.guild_id, user.id, started_at))
             else:
                 await interaction.followup.send(f"⚠️ **{user.display_name}**님은 잠광 중이 아닙니다.")
-        
-        await self.update_dashboard()
+
+        await self.update_dashboard(interaction.guild_id)
 
     # ==========================================
     # [Command 5] 테스트용 강제 시간 설정 (관리자)
     # ==========================================
     @app_commands.command(name="강제비움시간", description="[관리자/테스트] 마지막 비움 시간을 'N분 전'으로 강제 설정합니다.")
+    @app_commands.guild_only()
     @app_commands.describe(minutes="몇 분 전으로 돌릴까요? (예: 110 입력 시 즉시 알림 조건 충족)")
     @app_commands.default_permissions(administrator=True)
     async def force_clear_time(self, interaction: discord.Interaction, minutes: int):
         await interaction.response.defer(ephemeral=True)
-        # 1. 한국 시간 기준 계산
-        kst = pytz.timezone('Asia/Seoul')
-        now = datetime.datetime.now(kst)
-        
-        # 입력한 분(minutes)만큼 과거로 돌림
-        target_time = now - datetime.timedelta(minutes=minutes)
-        time_str = target_time.strftime('%Y-%m-%d %H:%M:%S')
-        
-        # 2. DB 업데이트
-        await self.bot.db.update_mining_last_cleared(time_str, None)
-        
+        # 1. 입력한 분(minutes)만큼 과거로 돌림
+        target_ts = clock.now() - minutes * 60
+        time_str = format_kst(target_ts)
+
+        # 2. 상태 + DB 업데이트
+        state = self.states.get(interaction.guild_id)
+        await state.clear(None, at=target_ts)
+
         # 3. 로그 및 대시보드 갱신
         bot_logger.warning(f"[!] [Mining] 관리자 테스트: 비움 시간 {minutes}분 전으로 변경")
-        await self.update_dashboard()
-        
+        await self.update_dashboard(interaction.guild_id)
+
         # 4. 결과 메시지
         await interaction.followup.send(
             f"🧪 **테스트 모드**: 마지막 비움 시간을 **{minutes}분 전**(`{time_str}`)으로 설정했습니다.\n"
-            f"잠시 후 타이머 체크 주기가 돌아오면 알림이 발송될 수 있습니다.",
+            f"알림 조건을 충족하면 즉시 알림이 발송됩니다.",
             ephemeral=True
         )
 
@@ -515,57 +656,49 @@ class Mining(commands.Cog):
     # [Command 6] 비움 기록 로그 확인 (관리자)
     # ==========================================
     @app_commands.command(name="비움기록", description="[관리자] 최근 비움 기록을 확인합니다.")
+    @app_commands.guild_only()
     @app_commands.describe(limit="몇 건의 기록을 볼까요? (기본 20)")
     @app_commands.default_permissions(administrator=True)
     async def view_clear_logs(self, interaction: discord.Interaction, limit: int = 20):
-        logs = await self.bot.db.get_mining_clear_logs(limit)
-        
+        await interaction.response.defer(ephemeral=True)
+        logs = await self.bot.db.get_mining_clear_logs(interaction.guild_id, limit)
+
         if not logs:
-            await interaction.response.send_message("📝 최근 비움 기록이 없습니다.", ephemeral=True)
+            await interaction.followup.send("📝 최근 비움 기록이 없습니다.", ephemeral=True)
             return
 
         lines = []
+        # 화면에 보여줄 유저들의 이름을 한 번에 조회 (REST 조회는 동시에, 최대 3초 대기)
+        names = await self.bot.names.resolve_many([uid for uid, _ in logs[:limit]], default="알 수 없음", wait=3.0)
+
         # limit 개수까지만 화면에 보여주도록 반복 (마지막 1개는 순수하게 계산용)
         for i in range(min(len(logs), limit)):
-            uid, time_str = logs[i]
-            
-            # 닉네임 가져오기 (최적화 적용)
-            nick = await self.bot.db.get_user_nickname(uid)
-            if not nick:
-                try:
-                    u_obj = self.bot.get_user(uid) or await self.bot.fetch_user(uid)
-                    nick = u_obj.display_name
-                except:
-                    nick = "알 수 없음"
-            
-            # 1. 초 단위까지 표시되도록 포맷 가공 (YYYY- 자르기) -> MM-DD HH:MM:SS
-            short_time = time_str[5:]
-            
+            uid, cleared_at = logs[i]
+
+            nick = names[uid]
+
+            # 1. 초 단위까지 표시 -> MM-DD HH:MM:SS
+            short_time = format_kst(cleared_at, '%m-%d %H:%M:%S')
+
             # 2. 이전 기록과의 시간 차이 계산
             diff_text = ""
             # 현재 로그의 다음 인덱스(i+1)가 이전 시간 로그임 (최신순 정렬이므로)
             if i + 1 < len(logs):
-                prev_time_str = logs[i+1][1]
-                
-                curr_dt = datetime.datetime.strptime(time_str, '%Y-%m-%d %H:%M:%S')
-                prev_dt = datetime.datetime.strptime(prev_time_str, '%Y-%m-%d %H:%M:%S')
-                
-                diff = curr_dt - prev_dt
-                total_seconds = int(diff.total_seconds())
-                
+                total_seconds = cleared_at - logs[i+1][1]
+
                 hours, remainder = divmod(total_seconds, 3600)
                 minutes, _ = divmod(remainder, 60)
-                
+
                 if hours > 0:
                     diff_text = f" `(+{hours}시간 {minutes}분)`"
                 else:
                     diff_text = f" `(+{minutes}분)`"
-            
+
             lines.append(f"• {short_time} - **{nick}**{diff_text}")
-            
+
         embed = discord.Embed(title="🗑️ 최근 상자 비움 기록", description="\n".join(lines), color=discord.Color.blue())
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        await interaction.followup.send(embed=embed, ephemeral=True)
 
 
 async def setup(bot):
-    await bot.add_cog(Mining(bot))
\ No newline at end of file
+    await bot.add_cog(Mining(bot))
@@ -1,74 +1,202 @@
 import discord
 from discord import app_commands
-from discord.ext import commands
-import unicodedata
-from modules.logger import bot_logger
+from discord.ext import commands, tasks
+import asyncio
+from modules import clock
+from modules.clock import format_kst, format_duration, short_kst
+from modules.database import LEGACY_GUILD_ID
+from modules.logger import bot_logger, log_event
+from modules.tool_cache import GuildToolCaches
+from modules.search_index import matches
+from modules.lru_cache import LRUCache, MISSING
+from modules.text_layout import Columns
+
+# /도구목록 한 페이지의 표 최대 글자 수 (디스코드 메시지 한도 2,000자에서 제목/코드블록 여유분 제외)
+PAGE_CHAR_LIMIT = 1800
+
+# 렌더링해 둔 (길드, 종류)별 목록 페이지 최대 개수
+PAGE_CACHE_SIZE = 1000
+
+# 연체 확인 주기 기본값 (초)
+OVERDUE_SWEEP_INTERVAL = 600
+
+# ==========================================
+# [UI View] 도구 목록 페이지 넘김 버튼
+# ==========================================
+class ToolListView(discord.ui.View):
+    def __init__(self, cog, guild_id, kind, page_count):
+        super().__init__(timeout=300)
+        self.cog = cog
+        self.guild_id = guild_id
+        self.kind = kind
+        self.page = 0
+        self._sync_buttons(page_count)
+
+    def _sync_buttons(self, page_count):
+        self.prev_button.disabled = self.page <= 0
+        self.next_button.disabled = self.page >= page_count - 1
+
+    async def _move(self, interaction: discord.Interaction, step):
+        # 넘길 때마다 최신 페이지를 가져옴 (목록이 바뀌었으면 다시 렌더링된 페이지)
+        pages = await self.cog.get_list_pages(self.guild_id, self.kind)
+        if not pages:
+            return await interaction.response.edit_message(content="❌ 존재하지 않는 도구 종류입니다.", view=None)
+
+        self.page = max(0, min(self.page + step, len(pages) - 1))
+        self._sync_buttons(len(pages))
+        await interaction.response.edit_message(content=pages[self.page], view=self)
+
+    @discord.ui.button(label="이전", style=discord.ButtonStyle.secondary, emoji="◀️")
+    async def prev_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._move(interaction, -1)
+
+    @discord.ui.button(label="다음", style=discord.ButtonStyle.secondary, emoji="▶️")
+    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._move(interaction, 1)
+
 
 class Tools(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        # 자동완성 속도를 위한 메모리 캐시 (DB 부하 방지)
-        # 구조: { "곡괭이": { "피닉스 곡괭이": {info...}, ... }, "낚싯대": ... }
-        self.cache = {} 
-        self.cache_categories = set()
+        # 자동완성 속도를 위한 길드별 메모리 캐시 (DB 부하 방지)
+        # 길드에서 처음 사용할 때 적재하고, DB 커밋 후 변경된 도구만 반영 (write-through)
+        options = bot.config.get('tools', {})
+        self.caches = GuildToolCaches(
+            bot.db.get_all_tools,
+            idle_ttl=options.get('partition_idle_ttl', 1800),
+            max_partitions=options.get('max_partitions', 0)
+        )
+        self._adopt_task = None
+
+        # 연체 기준 (종류별 최대 대여 시간, 0이면 해당 종류는 확인 안 함)
+        overdue = options.get('overdue', {})
+        self.overdue_default = int(overdue.get('default_hours', 0) * 3600)
+        self.overdue_hold_times = {cat: int(hours * 3600) for cat, hours in overdue.get('categories', {}).items()}
+        self.overdue_interval = overdue.get('sweep_interval', OVERDUE_SWEEP_INTERVAL)
+
+        # 렌더링된 /도구목록 페이지 { (길드, 종류): (종류 버전, [페이지, ...]) }
+        self.list_pages = LRUCache(maxsize=PAGE_CACHE_SIZE)
 
     async def cog_load(self):
-        """Cog 로드 시 캐시 초기화"""
-        await self.sync_cache()
-        bot_logger.info("[+] [Tools] 도구 모듈 로드 및 캐시 동기화 완료")
-
-    async def sync_cache(self):
-        """DB 내용을 메모리 캐시로 동기화 (이름순 정렬 저장)"""
-        raw_data = await self.bot.db.get_all_tools()
-        
-        raw_data.sort(key=lambda x: x[1])
-
-        self.cache = {}
-        self.cache_categories = set()
-
-        for category, name, b_id, b_name, b_nick, b_at in raw_data:
-            if category not in self.cache:
-                self.cache[category] = {} # 순서가 보장되는 Dict
-            self.cache_categories.add(category)
-            
-            self.cache[category][name] = {
-                'borrower_id': b_id,
-                'borrower_name': b_name,
-                'borrower_nick': b_nick,
-                'borrowed_at': b_at
-            }
+        """Cog 로드 시 유휴 캐시 정리 작업 시작 (도구 목록은 길드별로 처음 사용할 때 적재)"""
+        self.evict_idle_caches.start()
+        if self.overdue_default or any(self.overdue_hold_times.values()):
+            self.overdue_sweeper.change_interval(seconds=self.overdue_interval)
+            self.overdue_sweeper.start()
+        self._adopt_task = asyncio.create_task(self._adopt_legacy_tools())
+        bot_logger.info("[+] [Tools] 도구 모듈 로드 완료 (길드별 캐시는 처음 사용 시 적재)")
+
+    async def cog_unload(self):
+        """주기 작업 중지 (실행 중이던 작업이 끝날 때까지 대기)"""
+        running = [task for task in (self.evict_idle_caches.get_task(), self.overdue_sweeper.get_task(), self._adopt_task) if task is not None]
+        self.evict_idle_caches.cancel()
+        self.overdue_sweeper.cancel()
+        if self._adopt_task is not None:
+            self._adopt_task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+    async def get_cache(self, guild_id):
+        """길드의 도구 캐시 (없으면 DB에서 적재)"""
+        return await self.caches.get(guild_id)
+
+    async def sync_cache(self, guild_id):
+        """길드의 DB 내용을 메모리 캐시로 재적재 (관리자 동기화 명령 전용)"""
+        return await self.caches.reload(guild_id)
+
+    @tasks.loop(minutes=5)
+    async def evict_idle_caches(self):
+        """오래 쓰이지 않은 길드의 캐시 해제"""
+        evicted = self.caches.evict_idle()
+        if evicted:
+            bot_logger.info(f"[i] [Tools] 유휴 길드 캐시 {evicted}개 해제 (남은 길드 {len(self.caches)}개)")
+
+    @tasks.loop(seconds=OVERDUE_SWEEP_INTERVAL)
+    async def overdue_sweeper(self):
+        """연체 확인 주기 작업 (한 번 실패해도 다음 주기에 다시 확인)"""
+        try:
+            await self.notify_overdue(clock.now())
+        except Exception as e:
+            bot_logger.error(f"[-] [Tools] 연체 확인 중 예외 발생: {e}")
+
+    async def notify_overdue(self, now):
+        """최대 대여 시간을 넘긴 도구를 찾아 대여자별로 묶어 DM 알림 (도구당 대여 1회에 한 번)"""
+        # 기한이 지난 행만 색인으로 조회 (알림 보낸 대여는 제외됨)
+        rows = await self.bot.db.get_overdue_tools(now, self.overdue_hold_times, self.overdue_default)
+        rows = [row for row in rows if self.bot.owns_guild(row[0])]
+        if not rows:
+            return
+
+        by_holder = {}
+        for row in rows:
+            by_holder.setdefault((row[0], row[3]), []).append(row)
+
+        async def send_reminder(guild_id, user_id, items, target_user):
+            if target_user is None:
+                return False
+            guild = self.bot.get_guild(guild_id)
+            lines = [
+                f"- [{cat}] {name} (대여: {short_kst(borrowed_at)}, {format_duration(now - borrowed_at)} 경과)"
+                for _, cat, name, _, borrowed_at in items
+            ]
+            embed = discord.Embed(
+                title="⏰ 반납 알림",
+                description=(
+                    f"{f'**{guild.name}** 서버에서 ' if guild else ''}빌린 도구의 대여 기간이 지났습니다.\n"
+                    + "\n".join(lines)
+                    + "\n**다 쓰셨다면 `/반납` 해 주세요!**"
+                ),
+                color=discord.Color.orange()
+            )
+            try:
+                await target_user.send(embed=embed)
+                return True
+            except Exception:
+                return False
+
+        # 유저 조회와 DM 발송은 동시에 처리 (동시 실행 수는 NameResolver가 제한)
+        targets = await self.bot.names.fetch_users({user_id for _, user_id in by_holder})
+        results = await asyncio.gather(*(
+            send_reminder(guild_id, user_id, items, targets.get(user_id))
+            for (guild_id, user_id), items in by_holder.items()
+        ))
+
+        # DM 성공 여부와 상관없이 이번 대여에 대해서는 다시 알리지 않음
+        await self.bot.db.mark_overdue_notified([(g, cat, name, at) for g, cat, name, _, at in rows], now)
+        bot_logger.info(f"[i] [Tools] 연체 알림 {len(by_holder)}명 (도구 {len(rows)}개, DM 실패 {results.count(False)}명)")
+
+    @overdue_sweeper.before_loop
+    async def before_overdue_sweeper(self):
+        await self.bot.wait_until_ready()
+
+    async def _adopt_legacy_tools(self):
+        """단일 서버 시절 도구 목록(LEGACY_GUILD_ID)을 실제 길드로 이전
+
+        길드 결정 순서: config.json의 legacy_guild_id -> 봇이 속한 유일한 길드 (샤딩 미사용 시)
+        """
+        await self.bot.wait_until_ready()
+        if not await self.bot.db.get_all_tools(LEGACY_GUILD_ID):
+            return
+
+        guild_id = self.bot.config.get('legacy_guild_id')
+        if not guild_id and (self.bot.shard_count or 1) == 1 and len(self.bot.guilds) == 1:
+            guild_id = self.bot.guilds[0].id
+        if guild_id and not self.bot.owns_guild(guild_id):
+            return  # 다른 샤드 프로세스가 이전
+        if not guild_id:
+            bot_logger.warning("[!] [Tools] 이전 도구 목록의 길드를 찾지 못했습니다. (config.json의 legacy_guild_id 설정 필요)")
+            return
+
+        moved = await self.bot.db.adopt_legacy_tools(LEGACY_GUILD_ID, guild_id)
+        if moved:
+            self.caches.invalidate(guild_id)
+            bot_logger.info(f"[+] [Tools] 이전 도구 {moved}개를 길드 {guild_id}로 이전 완료")
+        else:
+            bot_logger.warning(f"[!] [Tools] 길드 {guild_id}에 이미 도구가 있어 이전 도구 목록을 이전하지 않았습니다.")
 
     # ==========================================
     # [Helper] 유틸리티 함수
     # ==========================================
 
-    def get_width(self, text):
-        width = 0
-        for char in text:
-            if unicodedata.east_asian_width(char) in ['W', 'F', 'A']:
-                width += 2
-            else:
-                width += 1
-        return width
-
-    def pad_text(self, text, target_width):
-        """표 정렬을 위한 공백 채우기"""
-        text = str(text) if text else "-"
-        current_width = self.get_width(text)
-        
-        if current_width > target_width:
-            # 너무 길면 자르기 (.. 추가)
-            temp = ""
-            curr = 0
-            for char in text:
-                w = 2 if unicodedata.east_asian_width(char) in ['W', 'F', 'A'] else 1
-                if curr + w > target_width - 2: break
-                temp += char
-                curr += w
-            return temp + ".." + " " * (target_width - (curr + 2))
-        else:
-            return text + " " * (target_width - current_width)
-
     async def get_real_name(self, user: discord.User):
         """DB에서 고정 닉네임 조회 -> 없으면 디스코드 닉네임 반환"""
         custom_nick = await self.bot.db.get_user_nickname(user.id)
@@ -81,10 +209,11 @@ class Tools(commands.Cog):
     # ==========================================
 
     async def type_autocomplete(self, interaction: discord.Interaction, current: str):
+        cache = await self.get_cache(interaction.guild_id)
         return [
             app_commands.Choice(name=t, value=t)
-            for t in sorted(list(self.cache_categories)) if current in t
-        ][:25]
+            for t in cache.search_categories(current)
+        ]
 
     async def borrow_name_autocomplete(self, interaction: discord.Interaction, current: str):
         # 1. 옵션 파싱 (기존과 동일)
@@ -101,22 +230,13 @@ class Tools(commands.Cog):
         
         selected_type = next((opt['value'] for opt in options if opt['name'] == target_type_key), None)
         
-        # 2. [최적화 핵심] 정렬 없이 앞에서부터 25개 찾으면 바로 리턴
-        if selected_type and selected_type in self.cache:
-            choices = []
-            # self.cache는 이미 이름순으로 정렬되어 있음 (sync_cache 덕분)
-            for name, info in self.cache[selected_type].items():
-                # 대여 가능한 것만 체크
-                if info['borrower_id'] is None:
-                    # 검색어가 없거나(전체목록), 검색어가 포함된 경우
-                    if not current or current in name:
-                        choices.append(app_commands.Choice(name=name, value=name))
-                        
-                        # [Speed Up] 25개 꽉 차면 더 이상 찾지 말고 끝냄
-                        if len(choices) >= 25:
-                            break
-            
-            return choices
+        # 2. [최적화 핵심] 검색 색인에서 대여 가능한 것만 최대 25개 (초성 검색 지원)
+        cache = await self.get_cache(interaction.guild_id)
+        if selected_type and selected_type in cache:
+            return [
+                app_commands.Choice(name=name, value=name)
+                for name in cache.search(selected_type, current, status='available')
+            ]
         
         return []
 
@@ -139,76 +259,106 @@ class Tools(commands.Cog):
         selected_type = next((opt['value'] for opt in options if opt['name'] == target_type_key), None)
         
         # 3. 캐시에서 검색 (내가 빌린 것만)
-        if selected_type and selected_type in self.cache:
+        cache = await self.get_cache(interaction.guild_id)
+        if selected_type and selected_type in cache:
             if selected_type == '전체반납':
                 return [] 
             
             choices = []
-            # self.cache는 이미 이름순 정렬되어 있음
-            for name, info in self.cache[selected_type].items():
-                if info['borrower_id'] == user_id:
-                    if not current or current in name:
-                        choices.append(app_commands.Choice(name=name, value=name))
-                        # [Speed Up] 25개 채우면 중단
-                        if len(choices) >= 25: break
+            # 유저별 인덱스에서 내가 빌린 것만 탐색 (이름순)
+            for _, name in cache.borrowed_by(user_id, selected_type):
+                if matches(name, current):
+                    choices.append(app_commands.Choice(name=name, value=name))
+                    # [Speed Up] 25개 채우면 중단
+                    if len(choices) >= 25: break
             
             return choices
         return []
 
     async def return_type_autocomplete(self, interaction: discord.Interaction, current: str):
-        user_id = interaction.user.id
-        my_types = set()
-        
-        for cat, tools in self.cache.items():
-            for t_info in tools.values():
-                if t_info['borrower_id'] == user_id:
-                    my_types.add(cat)
-                    break
-        
-        choices = ['전체반납'] + sorted(list(my_types))
-        return [app_commands.Choice(name=c, value=c) for c in choices if current in c][:25]
+        cache = await self.get_cache(interaction.guild_id)
+        choices = ['전체반납'] + cache.user_categories(interaction.user.id)
+        return [app_commands.Choice(name=c, value=c) for c in choices if matches(c, current)][:25]
 
     # ==========================================
     # [Command 1] 도구 목록
     # ==========================================
 
     @app_commands.command(name="도구목록", description="특정 종류의 도구 상태를 확인합니다.")
+    @app_commands.guild_only()
     @app_commands.autocomplete(kind=type_autocomplete)
     async def tool_list(self, interaction: discord.Interaction, kind: str):
-        if kind not in self.cache:
+        pages = await self.get_list_pages(interaction.guild_id, kind)
+        if not pages:
             return await interaction.response.send_message("❌ 존재하지 않는 도구 종류입니다.", ephemeral=True)
+
+        if len(pages) == 1:
+            return await interaction.response.send_message(pages[0], ephemeral=True)
+
+        view = ToolListView(self, interaction.guild_id, kind, len(pages))
+        await interaction.response.send_message(pages[0], view=view, ephemeral=True)
+
+    async def get_list_pages(self, guild_id, kind):
+        """종류별 목록 페이지 (그 종류의 도구가 바뀌었을 때만 다시 렌더링) -> 없는 종류면 None"""
+        cache = await self.get_cache(guild_id)
+        version = cache.versions.get(kind)
+        if version is None:
+            return None
+
+        cached = self.list_pages.get((guild_id, kind))
+        if cached is not MISSING and cached[0] == version:
+            return cached[1]
+
+        pages = self.render_list_pages(cache, kind)
+        self.list_pages.set((guild_id, kind), (version, pages))
+        return pages
+
+    def render_list_pages(self, cache, kind):
+        """목록 표를 메시지 한도 안에 들어가도록 여러 페이지로 나눠 렌더링"""
+        # 헤더 설정 (이름 20, 상태 10, 대여자 16, 대여 시간 12)
+        columns = Columns(20, 10, 16)
+        header = columns.row('이 름', '상 태', '대여자', '대여 시간')
+        separator = "-" * (columns.total_width + 12)
         
-        tools = self.cache[kind]
-        
-        # 헤더 설정
-        col_name, col_stat, col_who, col_time = 20, 10, 16, 12
-        header = f"{self.pad_text('이 름', col_name)} | {self.pad_text('상 태', col_stat)} | {self.pad_text('대여자', col_who)} | 대여 시간"
-        separator = "-" * (col_name + col_stat + col_who + col_time + 9)
-        
-        body = ""
-        for name in sorted(tools.keys()):
-            status = tools[name]
-            tool_name = self.pad_text(name, col_name)
-            
+        lines = []
+        for name, status in cache.iter_tools(kind):
             if status['borrower_id'] is None:
-                body += f"🟢 {tool_name} | {self.pad_text('대여가능', col_stat)} | {self.pad_text('-', col_who)} | -\n"
+                lines.append(f"🟢 {columns.row(name, '대여가능', '-', '-')}")
             else:
-                # 닉네임 표시: DB에서 고정 닉네임 확인 -> 없으면 저장된 스냅샷 사용
+                # 닉네임 표시: 대여 시점에 저장된 스냅샷 사용
                 # (목록 조회 시마다 DB를 긁으면 느리므로, 캐시값 사용)
                 display_nick = status['borrower_nick'] or "Unknown"
                 
                 # 시간 포맷 (초 단위 제거)
-                time_str = status['borrowed_at'][5:-3] if status['borrowed_at'] else "?"
+                time_str = short_kst(status['borrowed_at'])
                 
-                body += f"🔴 {tool_name} | {self.pad_text('대여중', col_stat)} | {self.pad_text(display_nick, col_who)} | {time_str}\n"
-
-        await interaction.response.send_message(f"**[ {kind} 목록 ]**\n```text\n{header}\n{separator}\n{body}```", ephemeral=True)
+                lines.append(f"🔴 {columns.row(name, '대여중', display_nick, time_str)}")
+
+        # 글자 수 기준으로 페이지 나누기
+        budget = PAGE_CHAR_LIMIT - len(header) - len(separator)
+        chunks = [[]]
+        size = 0
+        for line in lines:
+            if chunks[-1] and size + len(line) + 1 > budget:
+                chunks.append([])
+                size = 0
+            chunks[-1].append(line)
+            size += len(line) + 1
+
+        total = len(chunks)
+        pages = []
+        for index, chunk in enumerate(chunks, start=1):
+            page_no = f" ({index}/{total})" if total > 1 else ""
+            body = "".join(line + "\n" for line in chunk)
+            pages.append(f"**[ {kind} 목록 ]**{page_no}\n```text\n{header}\n{separator}\n{body}```")
+        return pages
 
     # ==========================================
     # [Command 2] 대여
     # ==========================================
 
     @app_commands.command(name="대여", description="도구를 대여합니다. (최대 3개)")
+    @app_commands.guild_only()
     @app_commands.describe(
     type1="1번 도구 종류", name1="1번 도구 이름",
     type2="2번 도구 종류", name2="2번 도구 이름",
@@ -232,46 +382,44 @@ class Tools(commands.Cog):
         # 1. 고정 닉네임 확인 2. 없으면 디스코드 닉네임
         real_nick = await self.get_real_name(interaction.user)
 
-        # 1. 현재 대여 개수 확인
-        current_count = await self.bot.db.get_user_rent_count(user_id)
-        
-        # 2. 요청 처리
-        targets = [{'type': type1, 'name': name1}]
-        if type2 and name2: targets.append({'type': type2, 'name': name2})
-        if type3 and name3: targets.append({'type': type3, 'name': name3})
-        
-        if current_count + len(targets) > 3:
+        # 2. 요청 정리
+        targets = [(type1, name1)]
+        if type2 and name2: targets.append((type2, name2))
+        if type3 and name3: targets.append((type3, name3))
+
+        # 3. 개수 제한 확인 + 대여를 한 트랜잭션에서 처리 (동시 대여 경쟁 방지)
+        now = clock.now()
+        guild_id = interaction.guild_id
+        current_count, results = await self.bot.db.borrow_many(guild_id, targets, user_id, user_name, real_nick, now, limit=3)
+
+        if results is None:
             return await interaction.followup.send(f"‼️ 대여 불가: 최대 3개까지만 동시에 대여 가능합니다. (현재: {current_count}개)")
 
         success_list = []
         fail_list = []
-        now = self.bot.db.get_korea_time()
+        events = []
 
-        for item in targets:
-            cat, name = item['type'], item['name']
-            
-            # DB 상태 확인 (동시성 문제 최소화)
-            status = await self.bot.db.get_tool_status(cat, name)
-            
-            if not status:
-                fail_list.append(f"{name} (존재하지 않는 도구입니다)")
-            elif status[0] is not None: # borrower_id가 있으면 대여중
+        cache = await self.get_cache(guild_id)
+        for cat, name, result in results:
+            if result == 'ok':
+                # 커밋 완료된 도구만 캐시에 반영
+                cache.set_borrower(cat, name, user_id, user_name, real_nick, now)
+                success_list.append(name)
+                events.append({'type': 'borrow', 'guild_id': guild_id, 'user_id': user_id, 'category': cat, 'tool': name})
+            elif result == 'taken':
                 fail_list.append(f"{name} (이미 대여중)")
             else:
-                # 대여 수행
-                await self.bot.db.update_borrow(cat, name, user_id, user_name, real_nick, now)
-                success_list.append(name)
+                fail_list.append(f"{name} (존재하지 않는 도구입니다)")
 
-        # 3. 캐시 동기화 (성공한 게 하나라도 있다면)
+        # 3. 로그 기록 (성공한 게 하나라도 있다면)
         if success_list:
-            await self.sync_cache()
-            bot_logger.info(f"[+] [대여] {real_nick}({user_name}): {', '.join(success_list)}")
+            log_event(f"[+] [대여] {real_nick}({user_name}): {', '.join(success_list)}", events)
 
         # 4. 결과 출력
         msg = "[ 대여 결과 ]\n"
         if success_list:
             msg += f"💚 성공: {', '.join(success_list)}\n"
-            msg += f"  (대여자: {real_nick}, 시간: {now})\n"
+            msg += f"  (대여자: {real_nick}, 시간: {format_kst(now)})\n"
         if fail_list:
             msg += f"❌ 실패: {', '.join(fail_list)}\n"
             
@@ -282,6 +430,7 @@ class Tools(commands.Cog):
     # ==========================================
 
     @app_commands.command(name="반납", description="도구를 반납합니다. (최대 3개)")
+    @app_commands.guild_only()
     @app_commands.describe(
         type1="1번 도구 종류", name1="1번 도구 이름 (비우면 해당 종류 내 도구 자동 선택)",
         type2="2번 도구 종류", name2="2번 도구 이름",
@@ -300,6 +449,8 @@ class Tools(commands.Cog):
         await interaction.response.defer()
         
         user_id = interaction.user.id
+        guild_id = interaction.guild_id
+        cache = await self.get_cache(guild_id)
         targets = []
         inputs = [(type1, name1), (type2, name2), (type3, name3)]
         
@@ -311,13 +462,10 @@ class Tools(commands.Cog):
 
             # Case A: 전체 반납
             if cat == '전체반납':
-                found_any = False
-                for c_key, tools in self.cache.items():
-                    for t_name, info in tools.items():
-                        if info['borrower_id'] == user_id:
-                            targets.append({'type': c_key, 'name': t_name})
-                            found_any = True
-                if not found_any:
+                my_all = cache.borrowed_by(user_id)
+                for c_key, t_name in my_all:
+                    targets.append({'type': c_key, 'name': t_name})
+                if not my_all:
                     msg_logs.append("⚠️ 전체 반납: 빌린 도구가 없습니다.")
                 # 전체 반납이 포함되면 뒤에 개별 입력은 무시해도 되지만, 일단 계속 진행
                 continue
@@ -325,7 +473,7 @@ class Tools(commands.Cog):
             # Case B: 개별 반납
             if not name: 
                 # 종류는 골랐는데 이름을 안 고름 -> 해당 종류에서 내가 빌린 것 자동 찾기
-                my_borrowed = [n for n, i in self.cache.get(cat, {}).items() if i['borrower_id'] == user_id]
+                my_borrowed = [n for _, n in cache.borrowed_by(user_id, cat)]
                 
                 if len(my_borrowed) == 1:
                     targets.append({'type': cat, 'name': my_borrowed[0]})
@@ -353,25 +501,33 @@ class Tools(commands.Cog):
         if not unique_targets and not msg_logs:
             return await interaction.followup.send("‼️ 반납할 도구가 없습니다.")
 
-        for item in unique_targets:
-            cat, name = item['type'], item['name']
-            
-            # DB 상태 확인 (더블 체크)
-            status = await self.bot.db.get_tool_status(cat, name)
-            
-            if not status or status[0] != user_id:
-                fail_list.append(name) # 내 것이 아니거나 이미 반납됨
-            else:
-                await self.bot.db.update_borrow(cat, name, None, None, None, None)
+        # 본인이 빌린 것만 반납되도록 한 트랜잭션에서 조건부 처리
+        results = await self.bot.db.return_many(guild_id, [(t['type'], t['name']) for t in unique_targets], user_id)
+
+        # 반납 처리 중 캐시가 해제됐을 수 있으므로 다시 가져와서 반영
+        cache = await self.get_cache(guild_id)
+        returned_at = clock.now()
+        events = []
+        for cat, name, result in results:
+            if result == 'ok':
+                # 대여 시간은 캐시에서 지우기 전에 계산
+                info = cache.get(cat, name)
+                borrowed_at = info['borrowed_at'] if info else None
+                cache.clear_borrower(cat, name)
                 success_list.append(name)
+                events.append({
+                    'type': 'return', 'guild_id': guild_id, 'user_id': user_id, 'category': cat, 'tool': name,
+                    'duration': returned_at - borrowed_at if borrowed_at else None
+                })
+            else:
+                fail_list.append(name) # 내 것이 아니거나 이미 반납됨
 
         # 3. 마무리 및 결과 출력
         if success_list:
-            await self.sync_cache()
             real_nick = await self.get_real_name(interaction.user)
-            bot_logger.info(f"[+] [반납] {real_nick}({interaction.user.name}): {', '.join(success_list)}")
+            log_event(f"[+] [반납] {real_nick}({interaction.user.name}): {', '.join(success_list)}", events)
             
-            result_msg = f"[ 반납 완료 ]\n✅ 항목: {', '.join(success_list)}\n  (시간: {self.bot.db.get_korea_time()})"
+            result_msg = f"[ 반납 완료 ]\n✅ 항목: {', '.join(success_list)}\n  (시간: {format_kst(returned_at)})"
         else:
             result_msg = ""
 
@@ -392,20 +548,21 @@ class Tools(commands.Cog):
     # [Command 4] 내 정보
     # ==========================================
     @app_commands.command(name="내정보", description="현재 대여 중인 목록을 확인합니다.")
+    @app_commands.guild_only()
     async def my_info(self, interaction: discord.Interaction):
-        items = await self.bot.db.get_user_borrowed_tools(interaction.user.id)
+        items = await self.bot.db.get_user_borrowed_tools(interaction.guild_id, interaction.user.id)
         real_nick = await self.get_real_name(interaction.user)
         
         if not items:
             return await interaction.response.send_message(f"📜 **{real_nick}**님은 대여 중인 도구가 없습니다.", ephemeral=True)
             
-        header = f"{self.pad_text('종류', 8)} | {self.pad_text('이름', 20)} | 대여 시간"
+        columns = Columns(8, 20)
+        header = columns.row('종류', '이름', '대여 시간')
         separator = "-" * 45
         body = ""
         
-        for cat, name, time in items:
-            time_str = time[5:-3] if time else "?"
-            body += f"{self.pad_text(cat, 8)} | {self.pad_text(name, 20)} | {time_str}\n"
+        for cat, name, borrowed_at in items:
+            body += columns.row(cat, name, short_kst(borrowed_at)) + "\n"
             
         await interaction.response.send_message(f"**[ 👤 {real_nick}님의 대여 목록 ]**\n```text\n{header}\n{separator}\n{body}```", ephemeral=True)
 
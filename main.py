@@ -1,10 +1,14 @@
 import discord
 from discord.ext import commands
+import asyncio
 import json
 import os
 import sys
 from modules.database import Database  # 작성했던 DB 모듈 import
-from modules.logger import bot_logger  # 방금 작성한 로거 import
+from modules.command_sync import sync_commands
+from modules.name_resolver import NameResolver
+from modules.logger import bot_logger, configure_logs, shutdown_logger  # 방금 작성한 로거 import
+from modules.startup import StartupTimeline
 
 # ==========================================
 # [1] 설정 로드
@@ -27,69 +31,157 @@ except Exception as e:
     bot_logger.error(f"[-] 설정 파일 로드 중 오류 발생: {e}")
     sys.exit(1)
 
+# 로그 보관 정책 (config.json의 "logs")
+configure_logs(config.get('logs', {}))
+
+# 샤딩 설정 (config.json의 "sharding")
+# - enabled: True면 AutoShardedBot으로 실행 (샤드 수는 디스코드 권장값 자동 사용)
+# - shard_count + shard_ids: 이 프로세스가 맡을 샤드 범위 지정 (여러 프로세스로 나눠 실행)
+SHARDING = config.get('sharding', {})
+
+if SHARDING.get('shard_ids') and not SHARDING.get('shard_count'):
+    bot_logger.error("[-] sharding.shard_ids를 지정하려면 sharding.shard_count도 필요합니다.")
+    sys.exit(1)
+
 # ==========================================
 # [2] 봇 클래스 정의
 # ==========================================
-class MyBot(commands.Bot):
+BotBase = commands.AutoShardedBot if SHARDING.get('enabled') else commands.Bot
+
+class MyBot(BotBase):
     def __init__(self):
         # Intents 설정
 
         intents = discord.Intents.default()
         intents.guilds = True
+
+        shard_options = {}
+        if SHARDING.get('enabled'):
+            if SHARDING.get('shard_count'):
+                shard_options['shard_count'] = SHARDING['shard_count']
+            if SHARDING.get('shard_ids'):
+                shard_options['shard_ids'] = SHARDING['shard_ids']
         
         super().__init__(
             command_prefix="!", 
             intents=intents,
-            help_command=None # 기본 도움말 끔 (슬래시 커맨드 위주라 불필요)
+            help_command=None, # 기본 도움말 끔 (슬래시 커맨드 위주라 불필요)
+            **shard_options
         )
     
-        # DB 인스턴스 생성
-        self.db = Database()
+        # 각 모듈(Cog)에서 참고할 설정값
+        self.config = config
+
+        # 시작 단계별 소요 시간 기록 (관리자 명령어 /시작기록 으로 확인)
+        self.startup = StartupTimeline()
+
+        # DB 인스턴스 생성 (config.json의 "database" 항목으로 성능 프로필 선택)
+        self.db = Database(config.get('database', {}))
+
+        # 유저 표시 이름 조회 서비스 (fetch_user 일괄/동시 처리 + TTL 캐시)
+        self.names = NameResolver(self, config.get('name_resolver', {}))
+
+    def owns_guild(self, guild_id):
+        """이 프로세스의 샤드가 담당하는 길드인지 (샤딩을 쓰지 않으면 항상 True)
+
+        백그라운드 작업(잠광 알림 등)은 담당 길드만 처리해야
+        여러 프로세스가 같은 DB를 써도 알림이 중복되지 않습니다.
+        """
+        shard_count = self.shard_count
+        if not shard_count or shard_count == 1:
+            return True
+
+        # 디스코드 샤드 배정 공식: (guild_id >> 22) % shard_count
+        shard_id = (guild_id >> 22) % shard_count
+        if isinstance(self, commands.AutoShardedBot):
+            return self.shard_ids is None or shard_id in self.shard_ids
+        return shard_id == self.shard_id
 
     async def setup_hook(self):
         """봇이 로그인한 직후, 준비 단계에서 실행되는 함수"""
         bot_logger.info("[*] [System] 봇 초기화 시작...")
+        timeline = self.startup
+        timeline.mark("로그인", since=0.0)
 
         # 1. 데이터베이스 초기화 (테이블 생성 등)
-        await self.db.initialize()
+        with timeline.step("DB 초기화"):
+            await self.db.initialize()
         
-        # 2. Cogs(기능 모듈) 로드
+        # 2. Cogs(기능 모듈) 로드 + 캐시 미리 채우기 (서로 독립적이라 동시에 실행)
         cogs_folder = 'cogs'
         if not os.path.exists(cogs_folder):
             os.makedirs(cogs_folder)
             bot_logger.warning(f"[!] '{cogs_folder}' 폴더가 없어 생성했습니다.")
 
-        for filename in os.listdir(cogs_folder):
-            if filename.endswith('.py') and not filename.startswith('__'):
-                extension_name = f"{cogs_folder}.{filename[:-3]}"
-                try:
+        async def load_cog(filename):
+            extension_name = f"{cogs_folder}.{filename[:-3]}"
+            try:
+                with timeline.step(f"모듈 로드: {filename}"):
                     await self.load_extension(extension_name)
-                    bot_logger.info(f"[+] [Module] '{filename}' 로드 완료")
-                except Exception as e:
-                    bot_logger.error(f"[-] [Module] '{filename}' 로드 실패: {e}")
+                bot_logger.info(f"[+] [Module] '{filename}' 로드 완료")
+            except Exception as e:
+                bot_logger.error(f"[-] [Module] '{filename}' 로드 실패: {e}")
+
+        async def warm_caches():
+            try:
+                with timeline.step("캐시 워밍: 고정 닉네임"):
+                    await self.db.warm_caches()
+            except Exception as e:
+                bot_logger.error(f"[-] [System] 닉네임 캐시 적재 실패: {e}")
+
+        filenames = sorted(
+            filename for filename in os.listdir(cogs_folder)
+            if filename.endswith('.py') and not filename.startswith('__')
+        )
+        with timeline.step("모듈 로드 (전체)"):
+            await asyncio.gather(warm_caches(), *(load_cog(filename) for filename in filenames))
 
         # 3. 슬래시 커맨드 동기화 (서버에 명령어 등록)
-        # 소규모 봇이므로 전역 동기화(self.tree.sync()) 사용
+        # 커맨드 트리 해시가 마지막 동기화 때와 같으면 생략 (재시작 속도 + 동기화 rate limit 회피)
         try:
-            synced = await self.tree.sync()
-            bot_logger.info(f"[+] [System] 슬래시 커맨드 {len(synced)}개 동기화 완료")
+            with timeline.step("커맨드 동기화"):
+                synced = await sync_commands(self, config.get('command_sync', {}))
+            if synced is not None:
+                bot_logger.info(f"[+] [System] 슬래시 커맨드 {synced}개 동기화 완료")
         except Exception as e:
             bot_logger.error(f"[-] [System] 커맨드 동기화 실패: {e}")
 
         # 4. 재시작 후에도 동작하는 영구 버튼 등록
-        from cogs.mining import DashboardView
-        self.add_view(DashboardView(self))
+        with timeline.step("영구 뷰 등록"):
+            from cogs.mining import DashboardView
+            self.add_view(DashboardView(self))
         bot_logger.info("[+] [System] 영구 버튼 뷰 등록 완료")
         
     async def on_ready(self):
         """봇이 완전히 준비되었을 때 실행"""
         bot_logger.info(f"[+] [System] {self.user} (ID: {self.user.id}) 로 로그인 성공!")
         bot_logger.info(f"[i] Running on: Discord.py {discord.__version__}")
+        if self.shard_count and self.shard_count > 1:
+            local_shards = getattr(self, 'shard_ids', None) or [self.shard_id]
+            bot_logger.info(f"[i] 샤드 {local_shards} / 전체 {self.shard_count}개, 담당 길드 {len(self.guilds)}개")
         
         # 상태 메시지 설정
         activity = discord.Game(name="/도구목록 | /잠광시작 | 봇 관리")
         await self.change_presence(status=discord.Status.online, activity=activity)
 
+        # 첫 준비 완료 시에만 시작 타임라인 기록 (재연결 시 on_ready가 다시 호출됨)
+        if not self.startup.ready:
+            self.startup.ready = True
+            self.startup.mark("게이트웨이 준비 (on_ready)")
+            for line in self.startup.format().splitlines():
+                bot_logger.info(f"[i] [Startup] {line}")
+
+    async def close(self):
+        """봇 종료 시 Discord 연결을 끊고 DB 커넥션도 정리"""
+        # super().close()가 확장(Cog)을 먼저 해제하고, 각 cog_unload는 취소한 백그라운드 작업
+        # (연체 확인, 캐시 정리, 알림 스케줄러 등)이 끝날 때까지 기다리므로 DB는 반드시 그 뒤에 닫음
+        await super().close()
+        await self.db.close()
+        bot_logger.info("[-] [System] 봇 종료 및 DB 연결 해제 완료")
+
+        # 대기 중인 로그를 모두 파일에 기록하고 로깅 스레드 종료
+        shutdown_logger()
+
 # ==========================================
 # [3] 봇 실행
 # ==========================================
@@ -0,0 +1,46 @@
+import calendar
+import time
+
+# 시간 값은 DB/메모리 모두 epoch 초(int)로 다루고, 화면에 보여줄 때만 KST 문자열로 변환
+KST_OFFSET = 9 * 3600  # UTC+9 (서머타임 없음) - SQL 집계/변환에도 사용
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+SHORT_FORMAT = '%m-%d %H:%M'
+
+# 명령어로 입력받는 KST 시각 형식 (앞에서부터 시도)
+INPUT_FORMATS = ('%Y-%m-%d %H:%M', '%Y-%m-%d')
+
+def now():
+    """현재 시각 (epoch 초)"""
+    return int(time.time())
+
+def format_kst(ts, fmt=TIME_FORMAT):
+    """epoch 초 -> KST 시간 문자열 (고정 오프셋이라 시간대 조회 없이 계산)"""
+    return time.strftime(fmt, time.gmtime(ts + KST_OFFSET))
+
+def parse_kst_input(text):
+    """명령어 입력 "YYYY-MM-DD" 또는 "YYYY-MM-DD HH:MM" (KST) -> (epoch 초, 날짜만 입력했는지), 형식이 틀리면 ValueError"""
+    text = text.strip()
+    for fmt in INPUT_FORMATS:
+        try:
+            parsed = time.strptime(text, fmt)
+        except ValueError:
+            continue
+        return calendar.timegm(parsed) - KST_OFFSET, fmt == '%Y-%m-%d'
+    raise ValueError(text)
+
+def short_kst(ts, default="?"):
+    """epoch 초 -> "MM-DD HH:MM" (목록/표 표시용, 없으면 default)"""
+    if ts is None:
+        return default
+    return format_kst(ts, SHORT_FORMAT)
+
+def format_duration(seconds):
+    """초 -> "N일 N시간 N분" 중 필요한 부분만"""
+    seconds = int(seconds)
+    days, hours, minutes = seconds // 86400, seconds % 86400 // 3600, seconds % 3600 // 60
+    if days:
+        return f"{days}일 {hours}시간"
+    if hours:
+        return f"{hours}시간 {minutes}분"
+    return f"{minutes}분"
@@ -0,0 +1,68 @@
+import hashlib
+import json
+import os
+import discord
+from modules.database import DATA_DIR
+from modules.logger import bot_logger
+
+# 마지막으로 동기화한 커맨드 트리 해시 저장 파일 { "global" | "guild:<id>": 해시 }
+HASH_FILE = os.path.join(DATA_DIR, "command_tree.json")
+
+def tree_hash(tree, guild=None):
+    """커맨드 트리(이름/옵션/설명/권한 등 디스코드에 등록되는 내용)의 해시
+
+    디스코드로 보내는 payload(to_dict)를 정렬된 JSON으로 만들어 해시하므로
+    코드 순서나 로드 순서가 달라도 내용이 같으면 같은 값이 나옵니다.
+    """
+    payload = [cmd.to_dict(tree) for cmd in tree.get_commands(guild=guild)]
+    payload.sort(key=lambda cmd: (cmd.get('type', 1), cmd['name']))
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def _load_hashes():
+    try:
+        with open(HASH_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_hashes(hashes):
+    # 임시 파일에 쓴 뒤 교체 (쓰는 도중 종료되어도 파일이 깨지지 않음)
+    temp_path = HASH_FILE + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(hashes, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, HASH_FILE)
+
+async def sync_commands(bot, options=None):
+    """커맨드 트리가 마지막 동기화 이후 바뀌었을 때만 동기화 -> 동기화한 커맨드 수 (생략 시 None)
+
+    options (config.json의 "command_sync"):
+        dev_guild_id : 지정하면 전역 대신 해당 서버에만 즉시 동기화 (개발용)
+        force        : True면 해시와 상관없이 항상 동기화
+    """
+    options = options or {}
+    guild = None
+    scope = "global"
+
+    dev_guild_id = options.get('dev_guild_id')
+    if dev_guild_id:
+        guild = discord.Object(id=dev_guild_id)
+        bot.tree.copy_global_to(guild=guild)
+        scope = f"guild:{dev_guild_id}"
+
+    current = tree_hash(bot.tree, guild=guild)
+    hashes = _load_hashes()
+
+    if not options.get('force') and hashes.get(scope) == current:
+        bot_logger.info(f"[i] [System] 커맨드 트리 변경 없음 -> 동기화 생략 ({scope})")
+        return None
+
+    synced = await bot.tree.sync(guild=guild)
+
+    # 동기화에 성공했을 때만 기록 (실패하면 다음 실행 때 다시 시도)
+    hashes[scope] = current
+    try:
+        _save_hashes(hashes)
+    except OSError as e:
+        bot_logger.warning(f"[!] [System] 커맨드 트리 해시 저장 실패: {e}")
+    return len(synced)
@@ -1,15 +1,112 @@
 import aiosqlite
+import asyncio
+import contextlib
 import os
-import datetime
-import pytz
+from modules.clock import KST_OFFSET, now as clock_now
+from modules.logger import bot_logger
+from modules.lru_cache import LRUCache, MISSING
 
 # 데이터 저장 경로 설정
 DATA_DIR = "data"
 DB_PATH = os.path.join(DATA_DIR, "tools.db")
 
+# 성능 프로필 (config.json의 "database": {"profile": "..."} 로 선택)
+# - performance: WAL + NORMAL 동기화 (쓰기 중에도 읽기가 막히지 않음)
+# - safe: 기본 롤백 저널 + FULL 동기화 (기존 동작과 동일)
+PRAGMA_PROFILES = {
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 64 * 1024 * 1024,  # 64MB
+        "cache_size": -16000,           # 음수 = KB 단위 (약 16MB)
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "safe": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+}
+DEFAULT_PROFILE = "performance"
+
+# 커넥션별로 재사용할 prepared statement 개수 (sqlite3 기본값 128)
+CACHED_STATEMENTS = 256
+
+# 닉네임 캐시 최대 인원 수 (config.json의 database.nickname_cache_size)
+DEFAULT_NICKNAME_CACHE_SIZE = 10000
+
+# IN (...) 조회 시 한 번에 넘길 최대 파라미터 수 (SQLite 기본 제한 999)
+MAX_IN_PARAMS = 900
+
+# 길드 단위 마이그레이션 이전(단일 서버 시절) 잠광 데이터의 임시 길드 ID
+LEGACY_GUILD_ID = 0
+
+# KST 시간 문자열('%Y-%m-%d %H:%M:%S') 컬럼 -> epoch 초 변환식 (이미 정수면 그대로, 형식이 다르면 NULL)
+def _kst_text_to_epoch(column):
+    return f"CASE WHEN typeof({column}) = 'integer' THEN {column} ELSE CAST(strftime('%s', {column}) AS INTEGER) - {KST_OFFSET} END"
+
+# 시각 컬럼을 epoch 초로 옮길 테이블 { 테이블: (새 스키마, 복사할 컬럼, 시각 컬럼) }
+EPOCH_TABLES = {
+    'users': ('''
+        CREATE TABLE users (
+            user_id INTEGER PRIMARY KEY,
+            custom_nickname TEXT,
+            created_at INTEGER
+        )
+    ''', ('user_id', 'custom_nickname', 'created_at'), 'created_at'),
+    'mining_config': ('''
+        CREATE TABLE mining_config (
+            guild_id INTEGER PRIMARY KEY,
+            channel_id INTEGER,
+            role_id INTEGER,
+            last_cleared_at INTEGER,
+            dashboard_msg_id INTEGER,
+            last_cleared_user_id INTEGER
+        )
+    ''', ('guild_id', 'channel_id', 'role_id', 'last_cleared_at', 'dashboard_msg_id', 'last_cleared_user_id'), 'last_cleared_at'),
+    'mining_users': ('''
+        CREATE TABLE mining_users (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            start_time INTEGER,
+            PRIMARY KEY (guild_id, user_id)
+        )
+    ''', ('guild_id', 'user_id', 'start_time'), 'start_time'),
+    'mining_clear_logs': ('''
+        CREATE TABLE mining_clear_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL DEFAULT 0,
+            user_id INTEGER,
+            cleared_at INTEGER
+        )
+    ''', ('id', 'guild_id', 'user_id', 'cleared_at'), 'cleared_at'),
+}
+
 class Database:
-    def __init__(self):
+    def __init__(self, options=None):
+        options = options or {}
         self.db_path = DB_PATH
+
+        # PRAGMA 설정 (프로필 + config.json의 개별 덮어쓰기)
+        profile = options.get("profile", DEFAULT_PROFILE)
+        if profile not in PRAGMA_PROFILES:
+            print(f"[DB] 알 수 없는 프로필 '{profile}' -> '{DEFAULT_PROFILE}' 사용")
+            profile = DEFAULT_PROFILE
+        self.profile = profile
+        self.pragmas = {**PRAGMA_PROFILES[profile], **options.get("pragmas", {})}
+
+        # WAL 체크포인트 주기 (초, 0이면 SQLite 자동 체크포인트에만 맡김)
+        self.checkpoint_interval = options.get("checkpoint_interval", 300)
+        self._checkpoint_task = None
+
+        # 고정 닉네임 캐시 { user_id: 닉네임 | None(고정 닉네임 없음) }
+        self.nicknames = LRUCache(options.get("nickname_cache_size", DEFAULT_NICKNAME_CACHE_SIZE))
+
+        # 봇 실행 동안 유지되는 단일 커넥션 (initialize()에서 열고 close()에서 닫음)
+        self.conn = None
+        # 쓰기 작업끼리 commit이 섞이지 않도록 직렬화
+        self._write_lock = asyncio.Lock()
         self._ensure_data_dir()
 
     def _ensure_data_dir(self):
@@ -19,18 +116,25 @@ class Database:
 
     async def initialize(self):
         """DB 연결 및 테이블 초기화 (봇 시작 시 호출)"""
-        async with aiosqlite.connect(self.db_path) as db:
-            # 1. 도구 테이블
+        if self.conn is None:
+            self.conn = await aiosqlite.connect(self.db_path, cached_statements=CACHED_STATEMENTS)
+            await self._apply_pragmas()
+
+        db = self.conn
+        async with self._write_lock:
+            # 1. 도구 테이블 (길드별 도구 목록)
             await db.execute('''
                 CREATE TABLE IF NOT EXISTS tools (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    guild_id INTEGER NOT NULL,
                     category TEXT NOT NULL,
                     name TEXT NOT NULL,
                     borrower_id INTEGER,
                     borrower_name TEXT,
                     borrower_nick TEXT,
-                    borrowed_at TEXT,
-                    UNIQUE(category, name)
+                    borrowed_at INTEGER,         -- 대여 시각 (epoch 초)
+                    overdue_notified_at INTEGER, -- 연체 알림을 보낸 시각 (대여/반납 시 초기화)
+                    UNIQUE(guild_id, category, name)
                 )
             ''')
             
@@ -39,50 +143,77 @@ class Database:
                 CREATE TABLE IF NOT EXISTS users (
                     user_id INTEGER PRIMARY KEY, -- Discord ID
                     custom_nickname TEXT,        -- 사용자가 설정한 고정 닉네임
-                    created_at TEXT
+                    created_at INTEGER           -- epoch 초
                 )
             ''')
 
-            # 3. 잠광 설정 테이블 (설정값 1개 row만 유지)
+            # 3. 잠광 설정 테이블 (길드당 1개 row)
             await db.execute('''
                 CREATE TABLE IF NOT EXISTS mining_config (
-                    id INTEGER PRIMARY KEY CHECK (id = 1), -- 오직 1개의 설정만 존재하도록 강제함 설정하면 id 1이 생김 
+                    guild_id INTEGER PRIMARY KEY,
                     channel_id INTEGER,
                     role_id INTEGER,
-                    last_cleared_at TEXT, -- 마지막 비움 시간
+                    last_cleared_at INTEGER, -- 마지막 비움 시각 (epoch 초)
                     dashboard_msg_id INTEGER,
                     last_cleared_user_id INTEGER -- 마지막으로 비운 유저 ID
                 )
             ''')
 
-            # 4. 잠광 진행중 유저 테이블
+            # 4. 잠광 진행중 유저 테이블 (길드별)
             await db.execute('''
                 CREATE TABLE IF NOT EXISTS mining_users (
-                    user_id INTEGER PRIMARY KEY,
-                    start_time TEXT
+                    guild_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    start_time INTEGER, -- 잠광 시작 시각 (epoch 초)
+                    PRIMARY KEY (guild_id, user_id)
                 )
             ''')
 
-            # [추가] 5. 상자 비움 로그 테이블
+            # [추가] 5. 상자 비움 로그 테이블 (길드별)
             await db.execute('''
                 CREATE TABLE IF NOT EXISTS mining_clear_logs (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    guild_id INTEGER NOT NULL DEFAULT 0,
                     user_id INTEGER,
-                    cleared_at TEXT
+                    cleared_at INTEGER -- epoch 초
+                )
+            ''')
+            
+            # 6. 도구 대여/반납 이력 (추가만 함, 상태 변경과 같은 트랜잭션에서 기록)
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS tool_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    guild_id INTEGER NOT NULL,
+                    ts INTEGER NOT NULL,     -- 발생 시각 (epoch 초)
+                    type TEXT NOT NULL,      -- borrow, return, force_return
+                    category TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    user_id INTEGER,
+                    duration INTEGER         -- 반납 시 대여 유지 시간 (초)
                 )
             ''')
 
-            # [추가] 6. 로그 100개 제한 트리거 (새 데이터 삽입 시 자동 실행)
+            # 7. 이력 집계 (tool_events 트리거로 증분 갱신, /도구통계는 여기서만 조회)
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS tool_usage_daily (
+                    guild_id INTEGER NOT NULL,
+                    day TEXT NOT NULL,       -- KST 날짜 (YYYY-MM-DD)
+                    category TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    borrows INTEGER NOT NULL DEFAULT 0,
+                    returns INTEGER NOT NULL DEFAULT 0,
+                    hold_seconds INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (guild_id, day, category, name)
+                )
+            ''')
             await db.execute('''
-                CREATE TRIGGER IF NOT EXISTS limit_logs_size
-                AFTER INSERT ON mining_clear_logs
-                BEGIN
-                    DELETE FROM mining_clear_logs 
-                    WHERE id NOT IN (
-                        SELECT id FROM mining_clear_logs 
-                        ORDER BY id DESC LIMIT 100
-                    );
-                END;
+                CREATE TABLE IF NOT EXISTS tool_usage_hourly (
+                    guild_id INTEGER NOT NULL,
+                    hour_ts INTEGER NOT NULL, -- 정시 기준 epoch 초
+                    borrows INTEGER NOT NULL DEFAULT 0,
+                    returns INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (guild_id, hour_ts)
+                )
             ''')
             
             await db.commit()
@@ -91,6 +222,81 @@ class Database:
             # 스키마 마이그레이션 (필요시 컬럼 추가 로직)
             await self._migrate_schema(db)
 
+            # 인덱스/트리거는 마이그레이션 후의 스키마 기준으로 생성
+            await self._create_indexes(db)
+
+        # WAL 모드일 때만 주기적 체크포인트 실행
+        if self.is_wal and self.checkpoint_interval and self._checkpoint_task is None:
+            self._checkpoint_task = asyncio.create_task(self._checkpoint_loop())
+
+    async def _apply_pragmas(self):
+        """선택된 프로필의 PRAGMA 적용 (트랜잭션 밖에서 실행되어야 함)"""
+        for key, value in self.pragmas.items():
+            if not key.isidentifier():
+                continue
+            await self.conn.execute(f"PRAGMA {key}={value}")
+
+        async with self.conn.execute("PRAGMA journal_mode") as cursor:
+            self.journal_mode = (await cursor.fetchone())[0].upper()
+        print(f"[DB] PRAGMA 프로필 '{self.profile}' 적용 (journal_mode={self.journal_mode})")
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        """쓰기 잠금 + BEGIN IMMEDIATE 트랜잭션 (정상 종료 시 commit, 예외 시 rollback)
+
+        IMMEDIATE로 시작하므로 트랜잭션 안의 확인(SELECT)과 변경(UPDATE) 사이에
+        다른 쓰기가 끼어들 수 없습니다.
+        """
+        async with self._write_lock:
+            await self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                await self.conn.rollback()
+                raise
+            else:
+                await self.conn.commit()
+
+    @property
+    def is_wal(self):
+        return getattr(self, "journal_mode", None) == "WAL"
+
+    async def checkpoint(self, mode="PASSIVE"):
+        """WAL 파일 내용을 본 DB로 반영 (PASSIVE는 다른 커넥션의 읽기/쓰기를 막지 않음)
+
+        커넥션을 공유하므로 진행 중인 쓰기 트랜잭션 사이에 끼어들지 않도록 쓰기 잠금을 잡습니다.
+        """
+        async with self._write_lock:
+            if self.conn is None or not self.is_wal:
+                return None
+            async with self.conn.execute(f"PRAGMA wal_checkpoint({mode})") as cursor:
+                return await cursor.fetchone()
+
+    async def _checkpoint_loop(self):
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            try:
+                await self.checkpoint()
+            except Exception as e:
+                bot_logger.error(f"[-] [DB] WAL 체크포인트 실패: {e}")
+
+    async def close(self):
+        """커넥션 종료 (봇 종료 시 호출)"""
+        if self._checkpoint_task is not None:
+            task, self._checkpoint_task = self._checkpoint_task, None
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        if self.conn is not None:
+            # 종료 전에 WAL을 비워 다음 실행 시 복구 작업이 없도록 함
+            try:
+                await self.checkpoint("TRUNCATE")
+            except Exception as e:
+                bot_logger.error(f"[-] [DB] 종료 체크포인트 실패: {e}")
+            await self.conn.close()
+            self.conn = None
+            print("[DB] 데이터베이스 연결 종료")
+
     async def _migrate_schema(self, db):
         """기존 DB에 새 컬럼이 없을 경우 자동 추가"""
 
@@ -101,146 +307,583 @@ class Database:
         if 'last_cleared_user_id' not in columns:
             await db.execute("ALTER TABLE mining_config ADD COLUMN last_cleared_user_id INTEGER")
             await db.commit()
+            columns.append('last_cleared_user_id')
+
+        # 단일 서버용 잠광 테이블 -> 길드별 테이블로 재구성
+        if 'guild_id' not in columns:
+            await self._migrate_mining_to_guilds(db)
+
+        # 단일 서버용 도구 테이블 -> 길드별 테이블로 재구성
+        async with db.execute("PRAGMA table_info(tools)") as cursor:
+            tool_columns = [row[1] for row in await cursor.fetchall()]
+
+        if 'guild_id' not in tool_columns:
+            await self._migrate_tools_to_guilds(db)
+
+        # 대여 시각 문자열 -> epoch 초 + 연체 알림 컬럼
+        tool_types = await self._column_types(db, 'tools')
+        if tool_types.get('borrowed_at') != 'INTEGER' or 'overdue_notified_at' not in tool_types:
+            await self._migrate_tools_epoch(db)
+
+        # 잠광/유저 시각 문자열 -> epoch 초 (길드별 구조 이전 후에 실행)
+        stale_tables = []
+        for table, (_, _, time_column) in EPOCH_TABLES.items():
+            if (await self._column_types(db, table)).get(time_column) != 'INTEGER':
+                stale_tables.append(table)
+        if stale_tables:
+            await self._migrate_epoch_columns(db, stale_tables)
+
+    async def _column_types(self, db, table):
+        """{ 컬럼명: 선언 타입(대문자) }"""
+        async with db.execute(f"PRAGMA table_info({table})") as cursor:
+            return {row[1]: row[2].upper() for row in await cursor.fetchall()}
+
+    async def _migrate_tools_to_guilds(self, db):
+        """도구 테이블에 guild_id 추가 (UNIQUE 제약이 바뀌므로 새 테이블로 복사)
+
+        기존 도구는 LEGACY_GUILD_ID로 보관되고 봇 준비 후 실제 길드로 이전됩니다.
+        """
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            await db.execute("ALTER TABLE tools RENAME TO tools_old")
+            await db.execute('''
+                CREATE TABLE tools (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    guild_id INTEGER NOT NULL,
+                    category TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    borrower_id INTEGER,
+                    borrower_name TEXT,
+                    borrower_nick TEXT,
+                    borrowed_at TEXT,
+                    UNIQUE(guild_id, category, name)
+                )
+            ''')
+            await db.execute('''
+                INSERT INTO tools (id, guild_id, category, name, borrower_id, borrower_name, borrower_nick, borrowed_at)
+                SELECT id, ?, category, name, borrower_id, borrower_name, borrower_nick, borrowed_at FROM tools_old
+            ''', (LEGACY_GUILD_ID,))
+            await db.execute("DROP TABLE tools_old")
+        except BaseException:
+            await db.rollback()
+            raise
+        else:
+            await db.commit()
+            print("[DB] 도구 테이블을 길드별 구조로 마이그레이션 완료")
+
+    async def _migrate_tools_epoch(self, db):
+        """tools.borrowed_at을 KST 시간 문자열에서 epoch 초(INTEGER)로 변환하고 연체 알림 컬럼 추가
+
+        컬럼 타입이 바뀌므로 새 테이블로 복사합니다.
+        """
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            await db.execute("ALTER TABLE tools RENAME TO tools_old")
+            await db.execute('''
+                CREATE TABLE tools (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    guild_id INTEGER NOT NULL,
+                    category TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    borrower_id INTEGER,
+                    borrower_name TEXT,
+                    borrower_nick TEXT,
+                    borrowed_at INTEGER,
+                    overdue_notified_at INTEGER,
+                    UNIQUE(guild_id, category, name)
+                )
+            ''')
+            await db.execute(f'''
+                INSERT INTO tools (id, guild_id, category, name, borrower_id, borrower_name, borrower_nick, borrowed_at)
+                SELECT id, guild_id, category, name, borrower_id, borrower_name, borrower_nick, {_kst_text_to_epoch("borrowed_at")}
+                FROM tools_old
+            ''')
+            await db.execute("DROP TABLE tools_old")
+        except BaseException:
+            await db.rollback()
+            raise
+        else:
+            await db.commit()
+            print("[DB] 도구 대여 시각을 epoch 초로 마이그레이션 완료")
+
+    async def _migrate_epoch_columns(self, db, tables):
+        """KST 시간 문자열 컬럼을 epoch 초(INTEGER)로 변환 (컬럼 타입이 바뀌므로 테이블별로 새로 만들어 복사)
+
+        mining_clear_logs의 트리거/인덱스는 테이블과 함께 삭제되고 _create_indexes에서 다시 만들어집니다.
+        """
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            for table in tables:
+                create_sql, columns, time_column = EPOCH_TABLES[table]
+                selects = ", ".join(_kst_text_to_epoch(c) if c == time_column else c for c in columns)
+                await db.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+                await db.execute(create_sql)
+                await db.execute(f"INSERT INTO {table} ({', '.join(columns)}) SELECT {selects} FROM {table}_old")
+                await db.execute(f"DROP TABLE {table}_old")
+        except BaseException:
+            await db.rollback()
+            raise
+        else:
+            await db.commit()
+            print(f"[DB] 시각 컬럼을 epoch 초로 마이그레이션 완료 ({', '.join(tables)})")
+
+    async def _migrate_mining_to_guilds(self, db):
+        """잠광 테이블에 guild_id 추가 (기존 데이터는 LEGACY_GUILD_ID로 보관)
+
+        기본키가 바뀌므로 ALTER 대신 새 테이블로 복사합니다.
+        보관된 데이터는 봇 준비 후 실제 길드로 이전됩니다. (MiningStates.adopt_legacy)
+        """
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            await db.execute("DROP TRIGGER IF EXISTS limit_logs_size")
+
+            await db.execute("ALTER TABLE mining_config RENAME TO mining_config_old")
+            await db.execute('''
+                CREATE TABLE mining_config (
+                    guild_id INTEGER PRIMARY KEY,
+                    channel_id INTEGER,
+                    role_id INTEGER,
+                    last_cleared_at TEXT,
+                    dashboard_msg_id INTEGER,
+                    last_cleared_user_id INTEGER
+                )
+            ''')
+            await db.execute('''
+                INSERT INTO mining_config (guild_id, channel_id, role_id, last_cleared_at, dashboard_msg_id, last_cleared_user_id)
+                SELECT ?, channel_id, role_id, last_cleared_at, dashboard_msg_id, last_cleared_user_id FROM mining_config_old
+            ''', (LEGACY_GUILD_ID,))
+            await db.execute("DROP TABLE mining_config_old")
+
+            await db.execute("ALTER TABLE mining_users RENAME TO mining_users_old")
+            await db.execute('''
+                CREATE TABLE mining_users (
+                    guild_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    start_time TEXT,
+                    PRIMARY KEY (guild_id, user_id)
+                )
+            ''')
+            await db.execute('''
+                INSERT INTO mining_users (guild_id, user_id, start_time)
+                SELECT ?, user_id, start_time FROM mining_users_old
+            ''', (LEGACY_GUILD_ID,))
+            await db.execute("DROP TABLE mining_users_old")
+
+            # 로그 테이블은 기본키가 그대로라 컬럼만 추가 (기존 행은 DEFAULT 0 = LEGACY_GUILD_ID)
+            async with db.execute("PRAGMA table_info(mining_clear_logs)") as cursor:
+                log_columns = [row[1] for row in await cursor.fetchall()]
+            if 'guild_id' not in log_columns:
+                await db.execute(f"ALTER TABLE mining_clear_logs ADD COLUMN guild_id INTEGER NOT NULL DEFAULT {LEGACY_GUILD_ID}")
+        except BaseException:
+            await db.rollback()
+            raise
+        else:
+            await db.commit()
+            print("[DB] 잠광 테이블을 길드별 구조로 마이그레이션 완료")
+
+    async def _create_indexes(self, db):
+        """조회용 인덱스 및 트리거 생성"""
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_tools_guild_borrower ON tools (guild_id, borrower_id)")
+        # 연체 확인용: 알림 전인 대여만 대여 시각 순으로 (기한 지난 행만 범위 조회)
+        await db.execute('''
+            CREATE INDEX IF NOT EXISTS idx_tools_overdue ON tools (borrowed_at)
+            WHERE borrower_id IS NOT NULL AND overdue_notified_at IS NULL
+        ''')
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_mining_clear_logs_guild ON mining_clear_logs (guild_id, id)")
+
+        # 로그는 길드별 최근 100개만 유지 (새 데이터 삽입 시 자동 실행)
+        await db.execute('''
+            CREATE TRIGGER IF NOT EXISTS limit_guild_logs_size
+            AFTER INSERT ON mining_clear_logs
+            BEGIN
+                DELETE FROM mining_clear_logs 
+                WHERE guild_id = NEW.guild_id AND id NOT IN (
+                    SELECT id FROM mining_clear_logs 
+                    WHERE guild_id = NEW.guild_id
+                    ORDER BY id DESC LIMIT 100
+                );
+            END;
+        ''')
+        await db.execute("DROP TRIGGER IF EXISTS limit_logs_size")
+
+        # 도구 이력 -> 일별(도구 단위)/시간별(길드 단위) 집계 증분 갱신
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_tool_events_guild_ts ON tool_events (guild_id, ts)")
+        await db.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS rollup_tool_events
+            AFTER INSERT ON tool_events
+            BEGIN
+                INSERT INTO tool_usage_daily (guild_id, day, category, name, borrows, returns, hold_seconds)
+                VALUES (
+                    NEW.guild_id, date(NEW.ts + {KST_OFFSET}, 'unixepoch'), NEW.category, NEW.name,
+                    NEW.type = 'borrow', NEW.type != 'borrow', COALESCE(NEW.duration, 0)
+                )
+                ON CONFLICT (guild_id, day, category, name) DO UPDATE SET
+                    borrows = borrows + excluded.borrows,
+                    returns = returns + excluded.returns,
+                    hold_seconds = hold_seconds + excluded.hold_seconds;
+
+                INSERT INTO tool_usage_hourly (guild_id, hour_ts, borrows, returns)
+                VALUES (NEW.guild_id, NEW.ts / 3600 * 3600, NEW.type = 'borrow', NEW.type != 'borrow')
+                ON CONFLICT (guild_id, hour_ts) DO UPDATE SET
+                    borrows = borrows + excluded.borrows,
+                    returns = returns + excluded.returns;
+            END;
+        ''')
+        await db.commit()
 
     # ==========================
     # [1] 공통 유틸리티
     # ==========================
     
-    def get_korea_time(self):
-        return datetime.datetime.now(pytz.timezone('Asia/Seoul')).strftime('%Y-%m-%d %H:%M:%S')
-
     # ==========================
     # [2] 도구 관련 쿼리
     # ==========================
 
-    async def get_all_tools(self):
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT category, name, borrower_id, borrower_name, borrower_nick, borrowed_at FROM tools ORDER BY category, name") as cursor:
-                return await cursor.fetchall()
+    async def get_all_tools(self, guild_id):
+        """길드의 모든 도구 (캐시 파티션 적재용)"""
+        async with self.conn.execute("SELECT category, name, borrower_id, borrower_name, borrower_nick, borrowed_at FROM tools WHERE guild_id=? ORDER BY category, name", (guild_id,)) as cursor:
+            return await cursor.fetchall()
 
-    async def get_tool_status(self, category, name):
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT borrower_id, borrower_name, borrower_nick, borrowed_at FROM tools WHERE category=? AND name=?", (category, name)) as cursor:
-                return await cursor.fetchone()
+    async def get_tool_status(self, guild_id, category, name):
+        async with self.conn.execute("SELECT borrower_id, borrower_name, borrower_nick, borrowed_at FROM tools WHERE guild_id=? AND category=? AND name=?", (guild_id, category, name)) as cursor:
+            return await cursor.fetchone()
 
-    async def update_borrow(self, category, name, user_id, user_name, user_nick, time_str):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('''
-                UPDATE tools 
-                SET borrower_id=?, borrower_name=?, borrower_nick=?, borrowed_at=? 
-                WHERE category=? AND name=?
-            ''', (user_id, user_name, user_nick, time_str, category, name))
-            await db.commit()
-            
-    async def get_user_rent_count(self, user_id):
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT COUNT(*) FROM tools WHERE borrower_id=?", (user_id,)) as cursor:
-                result = await cursor.fetchone()
-                return result[0] if result else 0
-
-    async def get_user_borrowed_tools(self, user_id):
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT category, name, borrowed_at FROM tools WHERE borrower_id=?", (user_id,)) as cursor:
-                return await cursor.fetchall()
+    async def borrow_many(self, guild_id, targets, user_id, user_name, user_nick, borrowed_at, limit=3):
+        """여러 도구를 한 트랜잭션에서 대여 처리 (대여 한도는 길드별)
+
+        targets: [(종류, 이름), ...]
+        borrowed_at: 대여 시각 (epoch 초)
+        반환: (기존 대여 개수, 결과 목록)
+            - 대여 한도 초과 시 결과 목록은 None (아무것도 변경하지 않음)
+            - 결과 목록: [(종류, 이름, 'ok' | 'taken' | 'missing'), ...]
+        """
+        async with self.transaction() as db:
+            async with db.execute("SELECT COUNT(*) FROM tools WHERE guild_id=? AND borrower_id=?", (guild_id, user_id)) as cursor:
+                current_count = (await cursor.fetchone())[0]
+
+            if current_count + len(targets) > limit:
+                return current_count, None
+
+            results = []
+            for category, name in targets:
+                # 비어있을 때만 대여 (확인과 변경을 한 문장으로 처리)
+                cursor = await db.execute('''
+                    UPDATE tools 
+                    SET borrower_id=?, borrower_name=?, borrower_nick=?, borrowed_at=?, overdue_notified_at=NULL 
+                    WHERE guild_id=? AND category=? AND name=? AND borrower_id IS NULL
+                ''', (user_id, user_name, user_nick, borrowed_at, guild_id, category, name))
+
+                if cursor.rowcount == 1:
+                    await db.execute(
+                        "INSERT INTO tool_events (guild_id, ts, type, category, name, user_id) VALUES (?, ?, 'borrow', ?, ?, ?)",
+                        (guild_id, borrowed_at, category, name, user_id)
+                    )
+                    results.append((category, name, 'ok'))
+                    continue
+
+                async with db.execute("SELECT 1 FROM tools WHERE guild_id=? AND category=? AND name=?", (guild_id, category, name)) as cursor:
+                    exists = await cursor.fetchone()
+                results.append((category, name, 'taken' if exists else 'missing'))
+
+            return current_count, results
+
+    async def return_many(self, guild_id, targets, user_id):
+        """여러 도구를 한 트랜잭션에서 반납 처리 (본인이 빌린 것만)
+
+        반환: [(종류, 이름, 'ok' | 'not_owner'), ...]
+        """
+        if not targets:
+            return []
+
+        async with self.transaction() as db:
+            now = clock_now()
+            results = []
+            for category, name in targets:
+                # 이력을 먼저 남기고 (대여 시각이 지워지기 전에 유지 시간 계산) 반납 처리
+                cursor = await self._record_return(db, guild_id, category, name, now, 'return', user_id)
+                if cursor.rowcount == 1:
+                    await self._clear_borrower(db, guild_id, category, name)
+                results.append((category, name, 'ok' if cursor.rowcount == 1 else 'not_owner'))
+            return results
+
+    async def force_return(self, guild_id, category, name):
+        """관리자 강제 반납 (대여자와 상관없이) -> 반납 처리 여부"""
+        async with self.transaction() as db:
+            cursor = await self._record_return(db, guild_id, category, name, clock_now(), 'force_return')
+            if cursor.rowcount != 1:
+                return False
+            await self._clear_borrower(db, guild_id, category, name)
+            return True
+
+    async def _record_return(self, db, guild_id, category, name, now, event_type, user_id=None):
+        """대여 중인 도구의 반납 이력 기록 (user_id가 있으면 본인이 빌린 경우만) -> 커서 (rowcount 0이면 대상 아님)"""
+        query = '''
+            INSERT INTO tool_events (guild_id, ts, type, category, name, user_id, duration)
+            SELECT guild_id, ?, ?, category, name, borrower_id, ? - borrowed_at
+            FROM tools
+            WHERE guild_id=? AND category=? AND name=? AND borrower_id IS NOT NULL
+        '''
+        params = [now, event_type, now, guild_id, category, name]
+        if user_id is not None:
+            query += " AND borrower_id=?"
+            params.append(user_id)
+        return await db.execute(query, params)
+
+    async def _clear_borrower(self, db, guild_id, category, name):
+        await db.execute('''
+            UPDATE tools 
+            SET borrower_id=NULL, borrower_name=NULL, borrower_nick=NULL, borrowed_at=NULL, overdue_notified_at=NULL 
+            WHERE guild_id=? AND category=? AND name=?
+        ''', (guild_id, category, name))
+
+    async def get_overdue_tools(self, now, hold_times, default_hold=0):
+        """최대 대여 시간을 넘겼고 아직 알리지 않은 대여 -> [(길드, 종류, 이름, 대여자 ID, 대여 시각), ...]
+
+        hold_times: { 종류: 최대 대여 시간(초) }, 목록에 없는 종류는 default_hold (0이면 확인 안 함)
+        가장 짧은 기한보다 오래된 행만 색인(idx_tools_overdue)으로 훑은 뒤 종류별 기한을 적용합니다.
+        """
+        holds = [hold for hold in hold_times.values() if hold > 0]
+        if default_hold > 0:
+            holds.append(default_hold)
+        if not holds:
+            return []
+
+        # 종류별 기한 (CASE category WHEN ... THEN ... ELSE 기본값 END), 0이면 NULL이 되어 제외
+        cases = "".join(" WHEN ? THEN ?" for _ in hold_times)
+        hold_expr = f"CASE category{cases} ELSE ? END" if hold_times else "?"
+        params = [now - min(holds)]
+        for category, hold in hold_times.items():
+            params += [category, hold or None]
+        params += [default_hold or None, now]
+
+        async with self.conn.execute(f'''
+            SELECT guild_id, category, name, borrower_id, borrowed_at FROM tools
+            WHERE borrower_id IS NOT NULL AND overdue_notified_at IS NULL AND borrowed_at <= ?
+              AND borrowed_at + ({hold_expr}) <= ?
+            ORDER BY borrowed_at
+        ''', params) as cursor:
+            return await cursor.fetchall()
+
+    async def mark_overdue_notified(self, tools, notified_at):
+        """연체 알림 보낸 대여 기록 (tools: [(길드, 종류, 이름, 대여 시각), ...], 그 사이 다시 대여된 도구는 제외)"""
+        if not tools:
+            return
+        async with self.transaction() as db:
+            await db.executemany(
+                "UPDATE tools SET overdue_notified_at=? WHERE guild_id=? AND category=? AND name=? AND borrowed_at=?",
+                [(notified_at, guild_id, category, name, borrowed_at) for guild_id, category, name, borrowed_at in tools]
+            )
+
+    async def get_user_borrowed_tools(self, guild_id, user_id):
+        async with self.conn.execute("SELECT category, name, borrowed_at FROM tools WHERE guild_id=? AND borrower_id=?", (guild_id, user_id)) as cursor:
+            return await cursor.fetchall()
             
-    async def add_tool(self, category, name):
-        async with aiosqlite.connect(self.db_path) as db:
+    async def add_tool(self, guild_id, category, name):
+        async with self._write_lock:
             try:
-                await db.execute("INSERT INTO tools (category, name) VALUES (?, ?)", (category, name))
-                await db.commit()
+                await self.conn.execute("INSERT INTO tools (guild_id, category, name) VALUES (?, ?, ?)", (guild_id, category, name))
+                await self.conn.commit()
                 return True
             except aiosqlite.IntegrityError:
+                await self.conn.rollback()
                 return False
 
-    async def remove_tool(self, category, name):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("DELETE FROM tools WHERE category=? AND name=?", (category, name))
-            await db.commit()
+    async def remove_tool(self, guild_id, category, name):
+        async with self._write_lock:
+            await self.conn.execute("DELETE FROM tools WHERE guild_id=? AND category=? AND name=?", (guild_id, category, name))
+            await self.conn.commit()
             return True
 
+    async def adopt_legacy_tools(self, legacy_guild_id, guild_id):
+        """임시 길드 ID로 보관된 도구를 실제 길드로 이전 (대상 길드에 도구가 있으면 이전하지 않음) -> 이전한 개수"""
+        async with self.transaction() as db:
+            async with db.execute("SELECT 1 FROM tools WHERE guild_id=? LIMIT 1", (guild_id,)) as cursor:
+                if await cursor.fetchone():
+                    return 0
+
+            cursor = await db.execute("UPDATE tools SET guild_id=? WHERE guild_id=?", (guild_id, legacy_guild_id))
+            return cursor.rowcount
+
+    # ==========================
+    # [2-1] 도구 이용 통계 (집계 테이블만 조회)
+    # ==========================
+
+    async def get_top_tools(self, guild_id, since_day, limit=10):
+        """since_day(KST 날짜) 이후 대여 횟수 상위 도구 -> [(종류, 이름, 대여 횟수), ...]"""
+        async with self.conn.execute('''
+            SELECT category, name, SUM(borrows) AS total FROM tool_usage_daily
+            WHERE guild_id=? AND day>=?
+            GROUP BY category, name HAVING total > 0
+            ORDER BY total DESC, category, name LIMIT ?
+        ''', (guild_id, since_day, limit)) as cursor:
+            return await cursor.fetchall()
+
+    async def get_category_hold_times(self, guild_id, since_day):
+        """종류별 (대여 횟수, 반납 횟수, 총 유지 시간(초)) -> [(종류, 대여, 반납, 유지 시간), ...]"""
+        async with self.conn.execute('''
+            SELECT category, SUM(borrows), SUM(returns), SUM(hold_seconds) FROM tool_usage_daily
+            WHERE guild_id=? AND day>=?
+            GROUP BY category ORDER BY category
+        ''', (guild_id, since_day)) as cursor:
+            return await cursor.fetchall()
+
+    async def get_hourly_borrows(self, guild_id, since_ts):
+        """KST 시(0~23)별 대여 횟수 -> [(시, 대여 횟수), ...]"""
+        async with self.conn.execute(f'''
+            SELECT (hour_ts + {KST_OFFSET}) / 3600 % 24 AS hour, SUM(borrows) FROM tool_usage_hourly
+            WHERE guild_id=? AND hour_ts>=?
+            GROUP BY hour ORDER BY hour
+        ''', (guild_id, since_ts)) as cursor:
+            return await cursor.fetchall()
+
     # ==========================
     # [3] 유저(닉네임) 관련 쿼리
     # ==========================
 
+    async def warm_caches(self):
+        """시작 시 고정 닉네임을 캐시에 미리 적재 (캐시 크기까지만)
+
+        캐시에 없는 닉네임은 조회 시 DB에서 읽어오므로, 모듈 로드와 동시에 실행해도 됩니다.
+        """
+        self.nicknames.clear()
+        async with self.conn.execute(
+            "SELECT user_id, custom_nickname FROM users WHERE custom_nickname != '' LIMIT ?",
+            (self.nicknames.maxsize,)
+        ) as cursor:
+            async for user_id, nickname in cursor:
+                self.nicknames.set(user_id, nickname)
+
     async def get_user_nickname(self, user_id):
-        """등록된 닉네임이 있으면 반환, 없으면 None"""
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT custom_nickname FROM users WHERE user_id=?", (user_id,)) as cursor:
-                result = await cursor.fetchone()
-                return result[0] if result else None
+        """등록된 닉네임이 있으면 반환, 없으면 None (캐시 우선)"""
+        nickname = self.nicknames.get(user_id)
+        if nickname is not MISSING:
+            return nickname
+
+        async with self.conn.execute("SELECT custom_nickname FROM users WHERE user_id=?", (user_id,)) as cursor:
+            result = await cursor.fetchone()
+
+        # 닉네임이 없는 유저도 None으로 캐싱 (반복 조회 방지)
+        nickname = result[0] if result and result[0] else None
+        self.nicknames.set(user_id, nickname)
+        return nickname
+
+    async def get_user_nicknames(self, user_ids):
+        """여러 유저의 고정 닉네임을 한 번에 조회 -> { user_id: 닉네임 | None }"""
+        result = {}
+        misses = []
+        for user_id in dict.fromkeys(user_ids):
+            nickname = self.nicknames.get(user_id)
+            if nickname is MISSING:
+                misses.append(user_id)
+            else:
+                result[user_id] = nickname
+
+        # 캐시에 없는 유저만 IN (...)으로 묶어서 조회
+        for i in range(0, len(misses), MAX_IN_PARAMS):
+            chunk = misses[i:i + MAX_IN_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            async with self.conn.execute(
+                f"SELECT user_id, custom_nickname FROM users WHERE user_id IN ({placeholders})", chunk
+            ) as cursor:
+                found = {user_id: nickname for user_id, nickname in await cursor.fetchall()}
+
+            for user_id in chunk:
+                nickname = found.get(user_id) or None
+                self.nicknames.set(user_id, nickname)
+                result[user_id] = nickname
+
+        return result
 
     async def set_user_nickname(self, user_id, nickname):
-        now = self.get_korea_time()
-        async with aiosqlite.connect(self.db_path) as db:
+        now = clock_now()
+        async with self._write_lock:
             # Upsert (있으면 업데이트, 없으면 삽입)
-            await db.execute('''
+            await self.conn.execute('''
                 INSERT INTO users (user_id, custom_nickname, created_at) 
                 VALUES (?, ?, ?)
                 ON CONFLICT(user_id) DO UPDATE SET custom_nickname=excluded.custom_nickname
             ''', (user_id, nickname, now))
-            await db.commit()
+            await self.conn.commit()
+
+        # 커밋 후 캐시 갱신 (빈 문자열 = 초기화 = 고정 닉네임 없음)
+        self.nicknames.set(user_id, nickname or None)
 
     # ==========================
-    # [4] 잠광(Mining) 관련 쿼리
+    # [4] 잠광(Mining) 관련 쿼리 (길드별)
     # ==========================
     
-    async def get_mining_config(self):
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT channel_id, role_id, last_cleared_at, dashboard_msg_id, last_cleared_user_id FROM mining_config WHERE id=1") as cursor:
-                return await cursor.fetchone()
+    async def get_all_mining_configs(self):
+        async with self.conn.execute("SELECT guild_id, channel_id, role_id, last_cleared_at, dashboard_msg_id, last_cleared_user_id FROM mining_config") as cursor:
+            return await cursor.fetchall()
 
-    async def set_mining_config(self, channel_id, role_id):
-        async with aiosqlite.connect(self.db_path) as db:
+    async def set_mining_config(self, guild_id, channel_id, role_id):
+        async with self._write_lock:
             # 초기 설정이 없으면 생성, 있으면 업데이트
-            await db.execute('''
-                INSERT INTO mining_config (id, channel_id, role_id) VALUES (1, ?, ?)
-                ON CONFLICT(id) DO UPDATE SET channel_id=excluded.channel_id, role_id=excluded.role_id
-            ''', (channel_id, role_id))
-            await db.commit()
+            await self.conn.execute('''
+                INSERT INTO mining_config (guild_id, channel_id, role_id) VALUES (?, ?, ?)
+                ON CONFLICT(guild_id) DO UPDATE SET channel_id=excluded.channel_id, role_id=excluded.role_id
+            ''', (guild_id, channel_id, role_id))
+            await self.conn.commit()
 
-    async def update_mining_last_cleared(self, time_str, user_id=None):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("UPDATE mining_config SET last_cleared_at=?, last_cleared_user_id=? WHERE id=1", (time_str, user_id))
+    async def update_mining_last_cleared(self, guild_id, cleared_at, user_id=None):
+        """마지막 비움 시각(epoch 초) 갱신"""
+        async with self._write_lock:
+            await self.conn.execute("UPDATE mining_config SET last_cleared_at=?, last_cleared_user_id=? WHERE guild_id=?", (cleared_at, user_id, guild_id))
             
             # user_id가 넘어왔을 때만(버튼을 눌렀을 때만) 로그 테이블에 추가
             if user_id:
-                await db.execute("INSERT INTO mining_clear_logs (user_id, cleared_at) VALUES (?, ?)", (user_id, time_str))
-            await db.commit()
+                await self.conn.execute("INSERT INTO mining_clear_logs (guild_id, user_id, cleared_at) VALUES (?, ?, ?)", (guild_id, user_id, cleared_at))
+            await self.conn.commit()
             
-    async def update_mining_dashboard_id(self, msg_id):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("UPDATE mining_config SET dashboard_msg_id=? WHERE id=1", (msg_id,))
-            await db.commit()
+    async def update_mining_dashboard_id(self, guild_id, msg_id):
+        async with self._write_lock:
+            await self.conn.execute("UPDATE mining_config SET dashboard_msg_id=? WHERE guild_id=?", (msg_id, guild_id))
+            await self.conn.commit()
 
-    async def add_mining_user(self, user_id):
-        now = self.get_korea_time()
-        async with aiosqlite.connect(self.db_path) as db:
+    async def add_mining_user(self, guild_id, user_id, started_at=None):
+        now = started_at or clock_now()
+        async with self._write_lock:
             try:
-                await db.execute("INSERT INTO mining_users (user_id, start_time) VALUES (?, ?)", (user_id, now))
-                await db.commit()
+                await self.conn.execute("INSERT INTO mining_users (guild_id, user_id, start_time) VALUES (?, ?, ?)", (guild_id, user_id, now))
+                await self.conn.commit()
                 return True
             except aiosqlite.IntegrityError:
+                await self.conn.rollback()
                 return False # 이미 진행중
 
-    async def remove_mining_user(self, user_id):
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute("DELETE FROM mining_users WHERE user_id=?", (user_id,))
-            await db.commit()
+    async def remove_mining_user(self, guild_id, user_id):
+        async with self._write_lock:
+            cursor = await self.conn.execute("DELETE FROM mining_users WHERE guild_id=? AND user_id=?", (guild_id, user_id))
+            await self.conn.commit()
             return cursor.rowcount > 0
         
-    async def remove_all_mining_users(self):
-        """잠광 중인 모든 유저를 한 번에 종료 처리"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("DELETE FROM mining_users")
-            await db.commit()
+    async def remove_all_mining_users(self, guild_id):
+        """길드에서 잠광 중인 모든 유저를 한 번에 종료 처리"""
+        async with self._write_lock:
+            await self.conn.execute("DELETE FROM mining_users WHERE guild_id=?", (guild_id,))
+            await self.conn.commit()
 
     async def get_all_mining_users(self):
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT user_id, start_time FROM mining_users") as cursor:
-                return await cursor.fetchall()
+        """모든 길드의 잠광 진행 인원 -> [(guild_id, user_id, start_time), ...]"""
+        async with self.conn.execute("SELECT guild_id, user_id, start_time FROM mining_users") as cursor:
+            return await cursor.fetchall()
             
-    async def get_mining_clear_logs(self, limit=20):
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT user_id, cleared_at FROM mining_clear_logs ORDER BY cleared_at DESC LIMIT ?", (limit+1,)) as cursor:
-                return await cursor.fetchall()
-            
\ No newline at end of file
+    async def get_mining_clear_logs(self, guild_id, limit=20):
+        async with self.conn.execute("SELECT user_id, cleared_at FROM mining_clear_logs WHERE guild_id=? ORDER BY id DESC LIMIT ?", (guild_id, limit+1)) as cursor:
+            return await cursor.fetchall()
+
+    async def adopt_legacy_mining(self, legacy_guild_id, guild_id):
+        """임시 길드 ID로 보관된 잠광 데이터를 실제 길드로 이전 (대상 길드에 데이터가 있으면 이전하지 않음)"""
+        async with self.transaction() as db:
+            async with db.execute('''
+                SELECT 1 FROM mining_config WHERE guild_id=?
+                UNION ALL SELECT 1 FROM mining_users WHERE guild_id=?
+                LIMIT 1
+            ''', (guild_id, guild_id)) as cursor:
+                if await cursor.fetchone():
+                    return False
+
+            await db.execute("UPDATE mining_config SET guild_id=? WHERE guild_id=?", (guild_id, legacy_guild_id))
+            await db.execute("UPDATE mining_users SET guild_id=? WHERE guild_id=?", (guild_id, legacy_guild_id))
+            await db.execute("UPDATE mining_clear_logs SET guild_id=? WHERE guild_id=?", (guild_id, legacy_guild_id))
+            return True
@@ -0,0 +1,117 @@
+import logging
+import os
+import sqlite3
+
+# 구조화 이벤트 저장소 (텍스트 로그와 별도의 SQLite 파일)
+EVENTS_DB_PATH = os.path.join("data", "events.db")
+
+# 한 번의 검색으로 돌려줄 최대 이벤트 수
+MAX_SEARCH_LIMIT = 1000
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts INTEGER NOT NULL,      -- 발생 시각 (epoch 초)
+        type TEXT NOT NULL,       -- borrow, return, force_return, mining_start ...
+        guild_id INTEGER,
+        user_id INTEGER,
+        category TEXT,
+        tool TEXT,
+        duration INTEGER,         -- 대여/잠광 지속 시간 (초)
+        message TEXT              -- 텍스트 로그와 같은 내용
+    );
+    CREATE INDEX IF NOT EXISTS idx_events_guild_ts ON events (guild_id, ts);
+    CREATE INDEX IF NOT EXISTS idx_events_guild_user_ts ON events (guild_id, user_id, ts);
+    CREATE INDEX IF NOT EXISTS idx_events_guild_tool_ts ON events (guild_id, tool, ts);
+'''
+
+class EventStoreHandler(logging.Handler):
+    """로그 레코드에 담긴 구조화 이벤트(record.events)를 SQLite에 추가만 하는 핸들러
+
+    QueueListener 스레드에서만 호출되므로 이벤트 루프를 막지 않습니다.
+    이벤트가 없는 일반 로그는 무시합니다.
+    """
+
+    def __init__(self, path=EVENTS_DB_PATH):
+        super().__init__()
+        self.path = path
+        self.conn = None
+
+    def _connect(self):
+        # 커넥션은 로깅 스레드에서 만들지만 종료(close)는 메인 스레드에서 호출됨
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def emit(self, record):
+        events = getattr(record, 'events', None)
+        if not events:
+            return
+        try:
+            if self.conn is None:
+                self.conn = self._connect()
+
+            message = record.getMessage()
+            ts = int(record.created)
+            self.conn.executemany(
+                "INSERT INTO events (ts, type, guild_id, user_id, category, tool, duration, message) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (ts, e['type'], e.get('guild_id'), e.get('user_id'), e.get('category'), e.get('tool'), e.get('duration'), message)
+                    for e in events
+                ]
+            )
+            self.conn.commit()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        super().close()
+
+
+def search_events(guild_id, user_id=None, category=None, tool=None, event_type=None, since=None, until=None, limit=100, path=EVENTS_DB_PATH):
+    """조건에 맞는 이벤트를 최신순으로 반환 -> [(ts, type, user_id, category, tool, duration, message), ...]
+
+    블로킹 함수이므로 봇에서는 asyncio.to_thread로 호출합니다.
+    """
+    if not os.path.exists(path):
+        return []
+
+    where = ["guild_id = ?"]
+    params = [guild_id]
+    if user_id is not None:
+        where.append("user_id = ?")
+        params.append(user_id)
+    if category:
+        where.append("category = ?")
+        params.append(category)
+    if tool:
+        where.append("tool = ?")
+        params.append(tool)
+    if event_type:
+        where.append("type = ?")
+        params.append(event_type)
+    if since is not None:
+        where.append("ts >= ?")
+        params.append(int(since))
+    if until is not None:
+        where.append("ts < ?")
+        params.append(int(until))
+    params.append(min(limit, MAX_SEARCH_LIMIT))
+
+    # 읽기 전용 커넥션 (로깅 스레드의 쓰기와 WAL로 동시에 동작)
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return conn.execute(
+            f"SELECT ts, type, user_id, category, tool, duration, message FROM events "
+            f"WHERE {' AND '.join(where)} ORDER BY ts DESC, id DESC LIMIT ?",
+            params
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return []  # 아직 이벤트가 한 번도 기록되지 않음 (테이블 없음)
+    finally:
+        conn.close()
@@ -1,14 +1,191 @@
+import atexit
+import datetime
+import gzip
 import logging
 import os
+import queue
+import re
+import shutil
 import sys
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import TimedRotatingFileHandler, QueueHandler, QueueListener
+from modules.event_store import EventStoreHandler
 
 # 로그 저장 경로 (프로젝트 루트의 data/logs 폴더)
 LOG_DIR = os.path.join("data", "logs")
+LOG_FILE = "bot.log"
+
+# 지난 로그 압축 파일 (bot.log.2023-10-01.gz), 압축 전 형식(bot.log.2023-10-01)도 함께 인식
+ARCHIVE_SUFFIX = ".gz"
+ARCHIVE_PATTERN = re.compile(r"^" + re.escape(LOG_FILE) + r"\.(\d{4}-\d{2}-\d{2})(\.gz)?$")
+
+# 기본 보관 정책 (config.json의 "logs"로 변경)
+LOG_RETENTION_DAYS = 90
+LOG_MAX_ARCHIVE_BYTES = 0  # 0이면 용량 제한 없음
+
+# 기록 대기 중인 로그 최대 개수 (가득 차면 아래 정책에 따라 버림)
+LOG_QUEUE_SIZE = 10000
+
+# 종료 시 큐에 자리가 날 때까지 기다리는 간격 (초, 그동안 로깅 스레드가 살아있는지 확인)
+SENTINEL_WAIT = 0.5
+
+class DroppingQueueHandler(QueueHandler):
+    """큐가 가득 차도 기다리지 않는 QueueHandler
+
+    - INFO 이하: 새 로그를 버림
+    - WARNING 이상: 가장 오래된 로그 하나를 버리고 새 로그를 넣음
+    버린 개수는 세어 두었다가 다음 로그가 들어갈 때 경고로 함께 남깁니다.
+
+    구조화 이벤트(record.events)는 버리지 않습니다. 새 로그든 밀려난 로그든
+    큐에 들어가지 못한 이벤트는 event_handler(EventStoreHandler)로 바로 기록하고,
+    텍스트 줄만 위 정책을 따릅니다.
+    """
+
+    def __init__(self, log_queue, event_handler=None):
+        super().__init__(log_queue)
+        self.event_handler = event_handler
+        self.dropped = 0
+        self._reported = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._store_events(record)
+            if record.levelno < logging.WARNING or not self._evict_oldest(record):
+                self.dropped += 1
+            return
+
+        # 이전에 버린 로그가 있으면 한 번 알림 (큐에 자리가 있을 때만)
+        if self.dropped != self._reported:
+            count, self._reported = self.dropped - self._reported, self.dropped
+            notice = logging.LogRecord(
+                record.name, logging.WARNING, __file__, 0,
+                f"[!] [Logger] 로그 대기열이 가득 차 {count}건을 기록하지 못했습니다.", None, None
+            )
+            try:
+                self.queue.put_nowait(notice)
+            except queue.Full:
+                pass
+
+    def _evict_oldest(self, record):
+        try:
+            self._store_events(self.queue.get_nowait())
+            self.dropped += 1
+            self.queue.put_nowait(record)
+            return True
+        except (queue.Empty, queue.Full):
+            return False
+
+    def _store_events(self, record):
+        """큐를 거치지 않고 이벤트 저장소에 바로 기록 (이후 같은 레코드가 큐로 가도 중복 저장되지 않음)"""
+        if self.event_handler is None or not getattr(record, 'events', None):
+            return
+        self.event_handler.handle(record)  # 핸들러 잠금으로 로깅 스레드의 기록과 직렬화됨
+        record.events = None
+
+
+class DrainingQueueListener(QueueListener):
+    """큐가 가득 차 있어도 종료 신호를 넣을 수 있는 QueueListener
+
+    기본 구현은 종료 신호를 put_nowait로 넣어 큐가 가득 차면 queue.Full로 실패합니다.
+    로깅 스레드가 큐를 비우는 동안 자리가 날 때까지 기다리고, 스레드가 이미 죽었으면 포기합니다.
+    (남은 로그는 shutdown_logger에서 직접 기록)
+    """
+
+    def enqueue_sentinel(self):
+        while True:
+            try:
+                self.queue.put(self._sentinel, timeout=SENTINEL_WAIT)
+                return
+            except queue.Full:
+                if self._thread is None or not self._thread.is_alive():
+                    return
+
+
+def log_archives():
+    """{ 날짜: 경로 } 지난 로그 목록 (같은 날짜에 압축본이 있으면 압축본 우선)"""
+    archives = {}
+    if not os.path.isdir(LOG_DIR):
+        return archives
+    for file_name in os.listdir(LOG_DIR):
+        match = ARCHIVE_PATTERN.match(file_name)
+        if not match:
+            continue
+        date, compressed = match.groups()
+        if compressed or date not in archives:
+            archives[date] = os.path.join(LOG_DIR, file_name)
+    return archives
+
+def _gzip_rotator(source, dest):
+    """회전된 로그를 gzip으로 압축 (임시 파일에 쓴 뒤 교체하므로 중간에 종료되어도 원본 유지)"""
+    temp_path = dest + ".tmp"
+    with open(source, 'rb') as src, gzip.open(temp_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(temp_path, dest)
+    os.remove(source)
+
+
+class ArchivingFileHandler(TimedRotatingFileHandler):
+    """매일 자정 회전 + 지난 로그 gzip 압축 + 보관 기간/용량 정리
+
+    회전은 로깅 스레드(QueueListener)에서 일어나므로 압축과 정리도 이벤트 루프 밖에서 처리됩니다.
+    """
+
+    def __init__(self, filename, retention_days=LOG_RETENTION_DAYS, max_archive_bytes=LOG_MAX_ARCHIVE_BYTES):
+        # backupCount는 정리(getFilesToDelete) 호출 여부로만 쓰이고, 실제 보관 개수는 아래 정책으로 결정
+        super().__init__(filename=filename, when="midnight", interval=1, backupCount=1, encoding="utf-8")
+        self.suffix = "%Y-%m-%d" # 백업 파일명 뒤에 날짜 형식
+        self.namer = lambda name: name + ARCHIVE_SUFFIX
+        self.rotator = _gzip_rotator
+        self.retention_days = retention_days
+        self.max_archive_bytes = max_archive_bytes
+
+    def doRollover(self):
+        super().doRollover()
+
+        # 압축 도입 전의 텍스트 백업도 함께 압축
+        for path in log_archives().values():
+            if not path.endswith(ARCHIVE_SUFFIX):
+                try:
+                    _gzip_rotator(path, path + ARCHIVE_SUFFIX)
+                except OSError:
+                    pass
+
+    def getFilesToDelete(self):
+        """보관 기간이 지났거나 용량 제한을 넘는 오래된 압축 로그 목록"""
+        archives = sorted(log_archives().items())  # 오래된 날짜부터
+        expired = []
+
+        if self.retention_days:
+            cutoff = (datetime.date.today() - datetime.timedelta(days=self.retention_days)).isoformat()
+            expired = [path for date, path in archives if date < cutoff]
+            archives = [(date, path) for date, path in archives if date >= cutoff]
+
+        if self.max_archive_bytes:
+            sizes = [os.path.getsize(path) for _, path in archives]
+            total = sum(sizes)
+            index = 0
+            while total > self.max_archive_bytes and index < len(archives) - 1:  # 가장 최근 1개는 남김
+                expired.append(archives[index][1])
+                total -= sizes[index]
+                index += 1
+
+        return expired
+
+
+_listener = None
+_queue_handler = None
+_output_handlers = []
+_file_handler = None
 
 def setup_logger():
-    """로깅 설정을 초기화하고 로거 인스턴스를 반환합니다."""
-    
+    """로깅 설정을 초기화하고 로거 인스턴스를 반환합니다.
+
+    실제 파일/터미널 출력(자정 회전 포함)은 별도 스레드(QueueListener)에서 처리하고,
+    봇 코드에서는 큐에 넣기만 하므로 로그 때문에 이벤트 루프가 멈추지 않습니다.
+    """
+    global _listener, _queue_handler, _output_handlers, _file_handler
+
     # 로그 폴더가 없으면 생성
     if not os.path.exists(LOG_DIR):
         os.makedirs(LOG_DIR)
@@ -17,6 +194,10 @@ def setup_logger():
     logger = logging.getLogger("MyBot")
     logger.setLevel(logging.INFO) # INFO 등급 이상만 기록 (Debug < Info < Warning < Error)
 
+    # 핸들러 등록 (중복 방지)
+    if logger.handlers:
+        return logger
+
     # 포맷 설정 (시간 - 등급 - 메시지)
     formatter = logging.Formatter(
         '[%(asctime)s] [%(levelname)s] %(message)s',
@@ -24,27 +205,83 @@ def setup_logger():
     )
 
     # 파일 핸들러 설정 (매일 자정마다 새 파일 생성)
-    # 파일명: bot.log -> (날짜 지나면) bot.log.2023-10-01
-    file_handler = TimedRotatingFileHandler(
-        filename=os.path.join(LOG_DIR, "bot.log"),
-        when="midnight",  # 자정 기준 회전
-        interval=1,       # 1일마다
-        backupCount=7,   # 7일치 로그 보관 (오래된 것 자동 삭제)
-        encoding="utf-8"
-    )
+    # 파일명: bot.log -> (날짜 지나면) bot.log.2023-10-01.gz
+    file_handler = ArchivingFileHandler(os.path.join(LOG_DIR, LOG_FILE))
     file_handler.setFormatter(formatter)
-    file_handler.suffix = "%Y-%m-%d" # 백업 파일명 뒤에 날짜 형식
+    _file_handler = file_handler
 
     # 스트림 핸들러 설정 (터미널 출력용)
     stream_handler = logging.StreamHandler(sys.stdout)
     stream_handler.setFormatter(formatter)
 
-    # 핸들러 등록 (중복 방지)
-    if not logger.handlers:
-        logger.addHandler(file_handler)
-        logger.addHandler(stream_handler)
-    
+    # 구조화 이벤트 저장소 (log_event로 남긴 이벤트만 기록)
+    event_handler = EventStoreHandler()
+
+    # 로거 -> (큐) -> 로깅 스레드 -> 파일/터미널/이벤트 저장소
+    _output_handlers = [file_handler, stream_handler, event_handler]
+    _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE), event_handler=event_handler)
+    _listener = DrainingQueueListener(_queue_handler.queue, *_output_handlers, respect_handler_level=True)
+    _listener.start()
+    logger.addHandler(_queue_handler)
+
+    # 정상 종료가 아니어도 남은 로그는 기록되도록
+    atexit.register(shutdown_logger)
+
     return logger
 
+def configure_logs(options=None):
+    """로그 보관 정책 적용 (config.json의 "logs")
+
+    retention_days    : 지난 로그 보관 일수 (0이면 기간 제한 없음)
+    max_archive_bytes : 지난 로그 압축 파일 총 용량 상한 (0이면 제한 없음)
+    """
+    options = options or {}
+    if _file_handler is None:
+        return
+    _file_handler.retention_days = options.get('retention_days', LOG_RETENTION_DAYS)
+    _file_handler.max_archive_bytes = options.get('max_archive_bytes', LOG_MAX_ARCHIVE_BYTES)
+
+def log_event(message, events, level=logging.INFO):
+    """텍스트 로그 한 줄 + 구조화 이벤트를 함께 기록
+
+    events: 이벤트 dict 하나 또는 목록
+        { 'type': 'borrow', 'guild_id': ..., 'user_id': ..., 'category': ..., 'tool': ..., 'duration': 초 }
+    """
+    if isinstance(events, dict):
+        events = [events]
+    bot_logger.log(level, message, extra={'events': events})
+
+def shutdown_logger():
+    """대기 중인 로그를 모두 기록하고 로깅 스레드 종료 (봇 종료 시 호출, 여러 번 호출해도 안전)
+
+    종료 이후의 로그는 큐를 거치지 않고 파일/터미널에 바로 기록합니다.
+    """
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+
+    listener, _listener = _listener, None
+    listener.stop()  # 큐에 남은 로그를 모두 처리한 뒤 스레드 종료
+
+    # 로깅 스레드가 먼저 죽어 처리되지 못한 로그는 여기서 직접 기록
+    while True:
+        try:
+            record = listener.queue.get_nowait()
+        except queue.Empty:
+            break
+        if record is not listener._sentinel:
+            listener.handle(record)
+
+    logger = logging.getLogger("MyBot")
+    logger.removeHandler(_queue_handler)
+    queue_handler, _queue_handler = _queue_handler, None
+    for handler in _output_handlers:
+        handler.flush()
+        logger.addHandler(handler)
+
+    # 알리지 못하고 남은 버림 건수는 종료 시 기록
+    if queue_handler.dropped != queue_handler._reported:
+        logger.warning(f"[!] [Logger] 로그 대기열이 가득 차 {queue_handler.dropped - queue_handler._reported}건을 기록하지 못했습니다.")
+
 # 다른 파일에서 import bot_logger만 하면 바로 쓸 수 있게 미리 생성
-bot_logger = setup_logger()
\ No newline at end of file
+bot_logger = setup_logger()
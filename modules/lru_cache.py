@@ -0,0 +1,65 @@
+import time
+from collections import OrderedDict
+
+# 캐시에 없음을 나타내는 값 (None은 "없음"을 캐싱하는 데 쓰이므로 구분)
+MISSING = object()
+
+class LRUCache:
+    """크기 제한(LRU) + 선택적 만료시간(TTL)을 가진 메모리 캐시
+
+    값으로 None을 저장하면 "조회했지만 없음"을 캐싱(negative caching)할 수 있으며,
+    캐시에 아예 없는 경우 get()은 MISSING을 반환합니다.
+    """
+
+    def __init__(self, maxsize=10000, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl  # 초 단위, None이면 만료 없음
+        self._data = OrderedDict()  # { key: (value, 만료 시각) }
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, count=False) is not MISSING
+
+    def get(self, key, count=True):
+        entry = self._data.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return value
+            del self._data[key]
+
+        if count:
+            self.misses += 1
+        return MISSING
+
+    def set(self, key, value, ttl=MISSING):
+        ttl = self.ttl if ttl is MISSING else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
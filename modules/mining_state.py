@@ -0,0 +1,207 @@
+import asyncio
+from modules import clock
+from modules.database import LEGACY_GUILD_ID
+
+# 상자 비움 알림 기준 (110분 = 1시간 50분)
+ALERT_MINUTES = 110
+
+
+class MiningState:
+    """한 길드의 잠광 상태 메모리 원본
+
+    설정/진행 인원/마지막 비움 시각을 시작 시 한 번만 DB에서 읽고,
+    이후 변경은 메모리와 DB에 함께 기록(write-through)합니다.
+    타이머와 대시보드는 DB 조회 없이 이 객체만 읽습니다.
+    시간 값은 모두 epoch 초(int)로 보관합니다.
+
+    상태가 바뀔 때마다 changed 이벤트를 울려 알림 스케줄러가
+    다음 알림 시각(alert_deadline)을 다시 계산하게 합니다.
+    (changed는 MiningStates의 모든 길드가 공유)
+    """
+
+    def __init__(self, db, guild_id, changed=None):
+        self.db = db
+        self.guild_id = guild_id
+
+        # 설정
+        self.channel_id = None
+        self.role_id = None
+        self.dashboard_msg_id = None
+
+        # 진행 상태
+        self.last_cleared_at = None
+        self.last_cleared_user_id = None
+        self.miners = {}  # { user_id: 시작 시각 }
+
+        # 알림 상태 (메모리 전용)
+        self.alert_sent = False
+        self.alert_message = None
+
+        # 상태 변경(확인 -> 기록)이 서로 섞이지 않도록 직렬화
+        self._lock = asyncio.Lock()
+
+        # 알림 시각에 영향을 주는 변경이 생기면 set
+        self.changed = changed if changed is not None else asyncio.Event()
+
+    # ==========================================
+    # [1] 적재 / 조회
+    # ==========================================
+
+    def _load_config(self, row):
+        channel_id, role_id, last_cleared, msg_id, last_cleared_user_id = row
+        self.channel_id = channel_id
+        self.role_id = role_id
+        self.dashboard_msg_id = msg_id
+        self.last_cleared_at = last_cleared
+        self.last_cleared_user_id = last_cleared_user_id
+
+    @property
+    def configured(self):
+        return self.channel_id is not None
+
+    def minutes_since_clear(self, now=None):
+        if self.last_cleared_at is None:
+            return None
+        now = clock.now() if now is None else now
+        return (now - self.last_cleared_at) / 60
+
+    def alert_deadline(self):
+        """다음 상자 비움 알림 시각 (보낼 알림이 없으면 None)"""
+        if not self.miners or not self.channel_id or self.last_cleared_at is None or self.alert_sent:
+            return None
+        return self.last_cleared_at + ALERT_MINUTES * 60
+
+    def notify(self):
+        """알림 스케줄러에 상태 변경 알림"""
+        self.changed.set()
+
+    # ==========================================
+    # [2] 상태 변경 (메모리 + DB)
+    # ==========================================
+
+    async def configure(self, channel_id, role_id):
+        """알림 채널/역할 설정 (설정 시점부터 타이머 시작)"""
+        async with self._lock:
+            await self.db.set_mining_config(self.guild_id, channel_id, role_id)
+            self.channel_id = channel_id
+            self.role_id = role_id
+            await self._set_cleared(clock.now(), None)
+
+    async def start(self, user_id):
+        """잠광 시작 -> (등록 여부, 0명→1명 전환 여부)
+
+        인원이 없다가 처음 시작된 경우 타이머를 지금 시점으로 리셋합니다.
+        """
+        async with self._lock:
+            if user_id in self.miners:
+                return False, False
+
+            now = clock.now()
+            if not await self.db.add_mining_user(self.guild_id, user_id, now):
+                return False, False
+
+            was_empty = not self.miners
+            self.miners[user_id] = now
+
+            if was_empty:
+                await self._set_cleared(now, None)
+            self.notify()
+            return True, was_empty
+
+    async def end(self, user_id):
+        """잠광 종료 -> 종료 처리 여부"""
+        async with self._lock:
+            if not await self.db.remove_mining_user(self.guild_id, user_id):
+                return False
+            self.miners.pop(user_id, None)
+            self.notify()
+            return True
+
+    async def end_all(self):
+        """전원 종료 -> 종료된 유저 ID 목록"""
+        async with self._lock:
+            user_ids = list(self.miners)
+            await self.db.remove_all_mining_users(self.guild_id)
+            self.miners.clear()
+            self.notify()
+            return user_ids
+
+    async def clear(self, user_id=None, at=None):
+        """상자 비움 기록 (user_id가 있으면 비움 로그에도 남김)"""
+        async with self._lock:
+            await self._set_cleared(clock.now() if at is None else int(at), user_id)
+
+    async def _set_cleared(self, ts, user_id):
+        await self.db.update_mining_last_cleared(self.guild_id, ts, user_id)
+        self.last_cleared_at = ts
+        self.last_cleared_user_id = user_id
+        self.alert_sent = False
+        self.notify()
+
+    async def set_dashboard_id(self, msg_id):
+        await self.db.update_mining_dashboard_id(self.guild_id, msg_id)
+        self.dashboard_msg_id = msg_id
+
+
+class MiningStates:
+    """길드별 MiningState 모음
+
+    시작 시 모든 길드의 설정/진행 인원을 쿼리 두 번으로 한꺼번에 읽어오고,
+    설정이 없는 길드는 처음 접근할 때 빈 상태로 만듭니다.
+    알림 스케줄러는 공유 이벤트(changed) 하나로 모든 길드의 변경을 감지합니다.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.states = {}  # { guild_id: MiningState }
+        self.changed = asyncio.Event()
+
+    def __len__(self):
+        return len(self.states)
+
+    def __iter__(self):
+        return iter(list(self.states.values()))
+
+    def __contains__(self, guild_id):
+        return guild_id in self.states
+
+    def get(self, guild_id):
+        """길드 상태 반환 (없으면 빈 상태 생성)"""
+        state = self.states.get(guild_id)
+        if state is None:
+            state = MiningState(self.db, guild_id, self.changed)
+            self.states[guild_id] = state
+        return state
+
+    async def load(self):
+        self.states.clear()
+        for guild_id, *config in await self.db.get_all_mining_configs():
+            self.get(guild_id)._load_config(config)
+
+        for guild_id, user_id, start in await self.db.get_all_mining_users():
+            self.get(guild_id).miners[user_id] = start
+
+        self.changed.set()
+
+    @property
+    def miner_count(self):
+        return sum(len(state.miners) for state in self.states.values())
+
+    async def adopt_legacy(self, guild_id):
+        """단일 서버 시절 데이터(LEGACY_GUILD_ID)를 실제 길드로 이전 -> 이전 여부"""
+        legacy = self.states.get(LEGACY_GUILD_ID)
+        if legacy is None or guild_id == LEGACY_GUILD_ID:
+            return False
+
+        existing = self.states.get(guild_id)
+        if existing is not None and (existing.configured or existing.miners):
+            return False  # 이미 새 방식으로 설정된 길드는 덮어쓰지 않음
+
+        if not await self.db.adopt_legacy_mining(LEGACY_GUILD_ID, guild_id):
+            return False
+
+        del self.states[LEGACY_GUILD_ID]
+        legacy.guild_id = guild_id
+        self.states[guild_id] = legacy
+        legacy.notify()
+        return True
@@ -0,0 +1,155 @@
+import asyncio
+from modules.lru_cache import LRUCache, MISSING
+from modules.logger import bot_logger
+
+class NameResolver:
+    """유저 표시 이름 조회 서비스
+
+    조회 순서: 고정 닉네임(DB 캐시) -> 디스코드 내부 캐시(get_user) -> TTL 캐시 -> REST(fetch_user)
+    REST 조회가 필요한 유저는 한 번에 모아 동시 실행 개수를 제한해서 처리하고,
+    화면 갱신이 느린 조회를 기다리지 않도록 임시 이름을 먼저 돌려준 뒤
+    조회가 끝나면 on_update 콜백으로 다시 그리게 합니다.
+    """
+
+    def __init__(self, bot, options=None):
+        options = options or {}
+        self.bot = bot
+        self.ttl = options.get("ttl", 600)                  # 조회한 이름 보관 시간(초)
+        self.failure_ttl = options.get("failure_ttl", 60)   # 조회 실패 결과 보관 시간(초)
+        self.names = LRUCache(options.get("cache_size", 5000), ttl=self.ttl)
+        self._semaphore = asyncio.Semaphore(options.get("max_concurrency", 5))
+        self._pending = {}  # { user_id: 진행 중인 조회 Task } (중복 요청 방지)
+
+        self.counters = {
+            'requests': 0,       # 이름 요청 수 (유저 단위)
+            'custom': 0,         # 고정 닉네임으로 해결
+            'discord_cache': 0,  # 디스코드 내부 캐시로 해결
+            'ttl_cache': 0,      # TTL 캐시로 해결
+            'fetched': 0,        # REST 조회 성공
+            'failed': 0,         # REST 조회 실패
+        }
+
+    # ==========================================
+    # [1] 이름 조회
+    # ==========================================
+
+    async def resolve(self, user_id, default=None, wait=None):
+        names = await self.resolve_many([user_id], default=default, wait=wait)
+        return names[user_id]
+
+    async def resolve_many(self, user_ids, default=None, wait=None, on_update=None):
+        """{ user_id: 표시 이름 } 반환
+
+        default   : 이름을 아직/끝내 못 얻었을 때 쓸 값 (None이면 "ID:유저ID")
+        wait      : REST 조회를 최대 몇 초까지 기다릴지 (None이면 기다리지 않음)
+        on_update : 기다리지 못한 조회가 끝났을 때 한 번 호출할 코루틴 함수
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        nicknames = await self.bot.db.get_user_nicknames(user_ids)
+
+        result = {}
+        misses = []
+        for user_id in user_ids:
+            self.counters['requests'] += 1
+            name = self._lookup_local(user_id, nicknames.get(user_id))
+            if name is MISSING:
+                misses.append(user_id)
+            else:
+                result[user_id] = name
+
+        if misses:
+            tasks = [self._schedule_fetch(user_id) for user_id in misses]
+            if wait:
+                await asyncio.wait(tasks, timeout=wait)
+
+            unresolved = False
+            for user_id, task in zip(misses, tasks):
+                name = task.result() if task.done() else None
+                if not task.done():
+                    unresolved = True
+                result[user_id] = name
+
+            # 기다리지 못한 조회가 모두 끝나면 한 번만 다시 그리도록 예약
+            if unresolved and on_update is not None:
+                gathered = asyncio.gather(*tasks, return_exceptions=True)
+                gathered.add_done_callback(lambda _: asyncio.ensure_future(on_update()))
+
+        for user_id, name in result.items():
+            if not name:
+                result[user_id] = default if default is not None else f"ID:{user_id}"
+        return result
+
+    def _lookup_local(self, user_id, custom_nick):
+        """REST 호출 없이 얻을 수 있는 이름 (없으면 MISSING)"""
+        if custom_nick:
+            self.counters['custom'] += 1
+            return custom_nick
+
+        user = self.bot.get_user(user_id)
+        if user is not None:
+            self.counters['discord_cache'] += 1
+            return user.display_name
+
+        name = self.names.get(user_id)
+        if name is not MISSING:
+            self.counters['ttl_cache'] += 1
+        return name
+
+    # ==========================================
+    # [2] REST 조회 (동시 실행 제한)
+    # ==========================================
+
+    def _schedule_fetch(self, user_id):
+        task = self._pending.get(user_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch_name(user_id))
+            self._pending[user_id] = task
+            task.add_done_callback(lambda _: self._pending.pop(user_id, None))
+        return task
+
+    async def _fetch_name(self, user_id):
+        user = await self.fetch_user(user_id)
+        if user is None:
+            # 실패한 유저도 잠시 캐싱해서 반복 호출 방지
+            self.names.set(user_id, None, ttl=self.failure_ttl)
+            return None
+
+        self.names.set(user_id, user.display_name)
+        return user.display_name
+
+    async def fetch_user(self, user_id):
+        """User 객체 조회 (디스코드 캐시 -> REST), 실패 시 None"""
+        user = self.bot.get_user(user_id)
+        if user is not None:
+            return user
+
+        async with self._semaphore:
+            try:
+                user = await self.bot.fetch_user(user_id)
+            except Exception as e:
+                self.counters['failed'] += 1
+                bot_logger.warning(f"[!] [Names] 유저 조회 실패 ({user_id}): {e}")
+                return None
+
+        self.counters['fetched'] += 1
+        return user
+
+    async def fetch_users(self, user_ids):
+        """여러 유저의 User 객체를 동시에 조회 -> { user_id: User | None }"""
+        user_ids = list(dict.fromkeys(user_ids))
+        users = await asyncio.gather(*(self.fetch_user(user_id) for user_id in user_ids))
+        return dict(zip(user_ids, users))
+
+    # ==========================================
+    # [3] 통계
+    # ==========================================
+
+    def stats(self):
+        requests = self.counters['requests']
+        local_hits = self.counters['custom'] + self.counters['discord_cache'] + self.counters['ttl_cache']
+        return {
+            **self.counters,
+            'pending': len(self._pending),
+            'cache_size': len(self.names),
+            'hit_rate': local_hits / requests if requests else 0.0,
+        }
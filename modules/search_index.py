@@ -0,0 +1,131 @@
+import heapq
+
+# 한글 음절(가~힣) 초성 분해용 상수
+HANGUL_BASE = 0xAC00
+HANGUL_LAST = 0xD7A3
+JUNG_JONG_COUNT = 21 * 28  # 초성 하나당 음절 수 (중성 21 x 종성 28)
+CHOSUNG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+CHOSUNG_SET = frozenset(CHOSUNG)
+
+def get_chosung(char):
+    """한글 음절이면 초성(호환 자모)을, 아니면 문자 그대로 반환"""
+    code = ord(char)
+    if HANGUL_BASE <= code <= HANGUL_LAST:
+        return CHOSUNG[(code - HANGUL_BASE) // JUNG_JONG_COUNT]
+    return char
+
+def to_search_key(text):
+    """검색용 키: 소문자 + 음절은 초성으로 치환 ("피닉스" -> "ㅍㄴㅅ")"""
+    return "".join(get_chosung(c) for c in text.lower())
+
+def _match_at(text, query, start):
+    """text[start:]가 query와 글자 단위로 일치하는지 (초성 입력은 해당 초성의 음절과 일치)"""
+    for offset, q in enumerate(query):
+        c = text[start + offset]
+        if c != q and not (q in CHOSUNG_SET and get_chosung(c) == q):
+            return False
+    return True
+
+def find_match(text, query, text_key=None, query_key=None):
+    """query가 처음 일치하는 위치 반환 (없으면 -1)
+
+    "피닉" / "ㅍㄴ" / "피ㄴ" 모두 "피닉스 곡괭이"의 0번 위치와 일치합니다.
+    """
+    if not query:
+        return 0
+    text = text.lower()
+    query = query.lower()
+    text_key = text_key if text_key is not None else to_search_key(text)
+    query_key = query_key if query_key is not None else to_search_key(query)
+
+    # 초성 키로 후보 위치를 빠르게 찾고, 실제 글자로 한 번 더 검증
+    pos = text_key.find(query_key)
+    while pos != -1:
+        if _match_at(text, query, pos):
+            return pos
+        pos = text_key.find(query_key, pos + 1)
+    return -1
+
+def matches(text, query):
+    return find_match(text, query) != -1
+
+
+class SearchIndex:
+    """자동완성용 n-gram 역색인 (초성 검색 지원)
+
+    이름마다 검색 키(to_search_key)의 1-gram/2-gram을 색인해 두고,
+    검색 시 질의 키의 n-gram 목록이 모두 포함된 이름만 후보로 뽑아 검증합니다.
+    추가/삭제는 이름 하나 단위로 반영됩니다.
+    """
+
+    def __init__(self, names=()):
+        self.keys = {}   # { 이름: (소문자 이름, 검색 키) }
+        self.grams = {}  # { n-gram: {이름, ...} }
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @staticmethod
+    def _grams(key):
+        grams = set(key)
+        grams.update(key[i:i + 2] for i in range(len(key) - 1))
+        return grams
+
+    def add(self, name):
+        if name in self.keys:
+            return
+        key = to_search_key(name)
+        self.keys[name] = (name.lower(), key)
+        for gram in self._grams(key):
+            self.grams.setdefault(gram, set()).add(name)
+
+    def remove(self, name):
+        entry = self.keys.pop(name, None)
+        if entry is None:
+            return
+        for gram in self._grams(entry[1]):
+            bucket = self.grams.get(gram)
+            if bucket is not None:
+                bucket.discard(name)
+                if not bucket:
+                    del self.grams[gram]
+
+    def _candidates(self, query_key):
+        if len(query_key) == 1:
+            grams = [query_key]
+        else:
+            grams = {query_key[i:i + 2] for i in range(len(query_key) - 1)}
+
+        buckets = []
+        for gram in grams:
+            bucket = self.grams.get(gram)
+            if not bucket:
+                return set()
+            buckets.append(bucket)
+
+        # 가장 작은 집합부터 교집합
+        buckets.sort(key=len)
+        result = set(buckets[0])
+        for bucket in buckets[1:]:
+            result &= bucket
+            if not result:
+                break
+        return result
+
+    def search(self, query, predicate=None, limit=25):
+        """query와 일치하는 이름을 (앞부분 일치 우선, 이름순) 최대 limit개 반환"""
+        query = query.lower()
+        query_key = to_search_key(query)
+
+        ranked = []
+        for name in self._candidates(query_key):
+            if predicate is not None and not predicate(name):
+                continue
+            lowered, key = self.keys[name]
+            pos = find_match(lowered, query, key, query_key)
+            if pos != -1:
+                ranked.append((pos != 0, pos, name))
+
+        return [name for _, _, name in heapq.nsmallest(limit, ranked)]
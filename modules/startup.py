@@ -0,0 +1,53 @@
+import contextlib
+import time
+
+class StartupTimeline:
+    """봇 시작 단계별 소요 시간 기록
+
+    step()으로 감싼 구간은 (시작 시점, 소요 시간, 성공 여부)를,
+    mark()는 봇 생성 시점부터 그 순간까지를 한 단계로 기록합니다.
+    동시에 실행되는 단계(모듈 병렬 로드 등)도 각자 따로 기록됩니다.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.steps = []  # [(이름, 시작 offset(초), 소요 시간(초), 성공 여부)]
+        self.ready = False
+
+    def _offset(self, t=None):
+        return (time.perf_counter() if t is None else t) - self.started_at
+
+    @contextlib.contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            self.steps.append((name, self._offset(start), time.perf_counter() - start, ok))
+
+    def mark(self, name, since=None):
+        """since(offset)부터 지금까지를 한 단계로 기록 (없으면 직전 단계의 끝부터)"""
+        if since is None:
+            since = max((offset + elapsed for _, offset, elapsed, _ in self.steps), default=0.0)
+        now = self._offset()
+        self.steps.append((name, since, now - since, True))
+
+    @property
+    def total(self):
+        return max((offset + elapsed for _, offset, elapsed, _ in self.steps), default=0.0)
+
+    def format(self):
+        """시작 시점 순으로 정렬된 표 형태의 문자열"""
+        lines = [f"[ 시작 타임라인 ] 총 {self.total:.3f}초"]
+        for name, offset, elapsed, ok in sorted(self.steps, key=lambda step: step[1]):
+            status = "" if ok else " (실패)"
+            start = f"+{offset:.3f}s"
+            lines.append(f"  {start:>9}  {elapsed:7.3f}s  {name}{status}")
+        return "\n".join(lines)
+
+    def slowest(self, count=3):
+        return sorted(self.steps, key=lambda step: step[2], reverse=True)[:count]
@@ -0,0 +1,73 @@
+import functools
+import unicodedata
+
+# 고정폭 글꼴에서 2칸을 차지하는 east_asian_width 분류 (A: 애매한 폭도 2칸으로 취급)
+WIDE_CLASSES = frozenset(('W', 'F', 'A'))
+
+# 한글 음절 범위 (가 ~ 힣)
+HANGUL_START, HANGUL_END = 0xAC00, 0xD7A3
+
+# 문자열 단위 캐시 크기 (도구 이름/닉네임처럼 반복해서 그려지는 문자열)
+TEXT_CACHE_SIZE = 20000
+
+@functools.lru_cache(maxsize=None)
+def _lookup_width(char):
+    return 2 if unicodedata.east_asian_width(char) in WIDE_CLASSES else 1
+
+def char_width(char):
+    """문자 하나의 표시 너비 (ASCII/한글 음절은 바로 계산, 그 외는 한 번만 조회 후 기억)"""
+    code = ord(char)
+    if code < 0x80:
+        return 1
+    if HANGUL_START <= code <= HANGUL_END:
+        return 2
+    return _lookup_width(char)
+
+@functools.lru_cache(maxsize=TEXT_CACHE_SIZE)
+def text_width(text):
+    """문자열의 표시 너비 (전각 2, 반각 1)"""
+    if text.isascii():
+        return len(text)
+    return sum(map(char_width, text))
+
+@functools.lru_cache(maxsize=TEXT_CACHE_SIZE)
+def _pad(text, target_width):
+    current_width = text_width(text)
+    if current_width <= target_width:
+        return text + " " * (target_width - current_width)
+
+    # 너무 길면 자르기 (.. 추가)
+    limit = target_width - 2
+    curr = 0
+    end = 0
+    for char in text:
+        w = char_width(char)
+        if curr + w > limit:
+            break
+        curr += w
+        end += 1
+    return text[:end] + ".." + " " * (limit - curr)
+
+def pad_text(text, target_width):
+    """표 정렬을 위한 공백 채우기 (빈 값은 "-", 넘치면 ".."로 자름)"""
+    return _pad(str(text) if text else "-", target_width)
+
+
+class Columns:
+    """고정 너비 표의 한 줄 포맷터
+
+    widths 개수보다 값이 많으면 나머지는 정렬 없이 그대로 붙입니다. (마지막 '대여 시간' 열 등)
+    """
+
+    def __init__(self, *widths, sep=" | "):
+        self.widths = widths
+        self.sep = sep
+
+    @property
+    def total_width(self):
+        return sum(self.widths) + len(self.sep) * len(self.widths)
+
+    def row(self, *values):
+        cells = [pad_text(value, width) for value, width in zip(values, self.widths)]
+        cells.extend(str(value) for value in values[len(self.widths):])
+        return self.sep.join(cells)
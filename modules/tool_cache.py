@@ -0,0 +1,351 @@
+import asyncio
+import bisect
+import itertools
+import time
+from collections import OrderedDict
+from modules.search_index import SearchIndex
+
+# 종류별 버전 번호 (모든 ToolCache가 공유하므로 재적재/재생성 후에도 이전 값과 겹치지 않음)
+_version_seq = itertools.count(1)
+
+class ToolCache:
+    """도구 목록 메모리 캐시 (자동완성/목록 조회용)
+
+    DB 커밋이 끝난 뒤 변경된 한 줄만 반영하는 write-through 방식이며,
+    전체 재적재(load)는 봇 시작 시와 관리자 동기화 명령에서만 수행합니다.
+
+    구조:
+        data  = { "곡괭이": { "피닉스 곡괭이": {info...}, ... }, "낚싯대": ... }
+        names = { "곡괭이": ["피닉스 곡괭이", ...] }  # 이름순 정렬 유지 (bisect)
+
+    보조 인덱스 (변경 시마다 함께 갱신):
+        by_borrower = { user_id: {(종류, 이름), ...} }
+        available   = { "곡괭이": [대여 가능한 이름, ...] }  # 이름순
+        borrowed    = { "곡괭이": [대여 중인 이름, ...] }    # 이름순
+        search_index = { "곡괭이": SearchIndex }          # 자동완성 검색용 (초성 지원)
+        versions     = { "곡괭이": 버전 번호 }               # 종류의 도구가 바뀔 때마다 증가 (렌더링 캐시 무효화용)
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.names = {}
+        self.sorted_categories = []
+        self.by_borrower = {}
+        self.available = {}
+        self.borrowed = {}
+        self.search_index = {}
+        self.category_index = SearchIndex()
+        self.versions = {}
+
+    # ==========================================
+    # [1] 전체 적재
+    # ==========================================
+
+    def load(self, rows):
+        """DB 전체 조회 결과로 캐시 재구성 (시작 시 / 관리자 동기화 시에만 사용)"""
+        self.data = {}
+        self.names = {}
+        self.by_borrower = {}
+        self.available = {}
+        self.borrowed = {}
+        self.versions = {}
+
+        for category, name, b_id, b_name, b_nick, b_at in rows:
+            self.data.setdefault(category, {})[name] = self._make_info(b_id, b_name, b_nick, b_at)
+
+        for category, tools in self.data.items():
+            self.versions[category] = next(_version_seq)
+            self.names[category] = sorted(tools)
+            self.available[category] = []
+            self.borrowed[category] = []
+            # 정렬된 순서대로 append하면 인덱스 목록도 정렬 상태 유지
+            for name in self.names[category]:
+                b_id = tools[name]['borrower_id']
+                if b_id is None:
+                    self.available[category].append(name)
+                else:
+                    self.borrowed[category].append(name)
+                    self.by_borrower.setdefault(b_id, set()).add((category, name))
+        self.sorted_categories = sorted(self.data)
+
+        self.search_index = {category: SearchIndex(names) for category, names in self.names.items()}
+        self.category_index = SearchIndex(self.sorted_categories)
+
+    @staticmethod
+    def _make_info(b_id=None, b_name=None, b_nick=None, b_at=None):
+        return {
+            'borrower_id': b_id,
+            'borrower_name': b_name,
+            'borrower_nick': b_nick,
+            'borrowed_at': b_at
+        }
+
+    # ==========================================
+    # [2] 조회
+    # ==========================================
+
+    @property
+    def categories(self):
+        """이름순으로 정렬된 도구 종류 목록"""
+        return self.sorted_categories
+
+    def __contains__(self, category):
+        return category in self.data
+
+    def __len__(self):
+        return sum(len(tools) for tools in self.data.values())
+
+    def get(self, category, name):
+        return self.data.get(category, {}).get(name)
+
+    def iter_tools(self, category):
+        """(이름, 정보)를 이름순으로 반환"""
+        tools = self.data.get(category)
+        if not tools:
+            return
+        for name in self.names[category]:
+            yield name, tools[name]
+
+    def iter_all(self):
+        """(종류, 이름, 정보)를 종류/이름순으로 반환"""
+        for category in self.sorted_categories:
+            for name, info in self.iter_tools(category):
+                yield category, name, info
+
+    def iter_all_borrowed(self):
+        """대여 중인 (종류, 이름, 정보)만 종류/이름순으로 반환"""
+        for category in self.sorted_categories:
+            tools = self.data[category]
+            for name in self.borrowed[category]:
+                yield category, name, tools[name]
+
+    def borrowed_by(self, user_id, category=None):
+        """특정 유저가 빌린 (종류, 이름) 목록 (보유 개수만큼만 탐색)"""
+        items = self.by_borrower.get(user_id, ())
+        if category is not None:
+            items = [item for item in items if item[0] == category]
+        return sorted(items)
+
+    def user_categories(self, user_id):
+        """특정 유저가 빌린 도구의 종류 목록 (이름순)"""
+        return sorted({category for category, _ in self.by_borrower.get(user_id, ())})
+
+    # ==========================================
+    # [2-1] 자동완성 검색
+    # ==========================================
+
+    def search(self, category, query, status=None, limit=25):
+        """종류 내 도구 이름 검색 (status: None=전체, 'available', 'borrowed')
+
+        검색어가 없으면 이름순 앞에서부터, 있으면 색인 후보만 검사해
+        앞부분 일치 우선으로 최대 limit개를 반환합니다.
+        """
+        if category not in self.data:
+            return []
+
+        if status == 'available':
+            pool = self.available[category]
+        elif status == 'borrowed':
+            pool = self.borrowed[category]
+        else:
+            pool = self.names[category]
+
+        if not query:
+            return pool[:limit]
+
+        predicate = None
+        if status is not None:
+            tools = self.data[category]
+            want_free = status == 'available'
+            predicate = lambda name: (tools[name]['borrower_id'] is None) == want_free
+
+        return self.search_index[category].search(query, predicate, limit)
+
+    def search_categories(self, query, limit=25):
+        if not query:
+            return self.sorted_categories[:limit]
+        return self.category_index.search(query, limit=limit)
+
+    # ==========================================
+    # [3] 변경분 반영 (DB 커밋 이후 호출)
+    # ==========================================
+
+    def add_tool(self, category, name):
+        if category not in self.data:
+            self.data[category] = {}
+            self.names[category] = []
+            self.available[category] = []
+            self.borrowed[category] = []
+            self.search_index[category] = SearchIndex()
+            bisect.insort(self.sorted_categories, category)
+            self.category_index.add(category)
+
+        old_info = self.data[category].get(name)
+        if old_info is None:
+            bisect.insort(self.names[category], name)
+            self.search_index[category].add(name)
+        else:
+            self._unindex(category, name, old_info)
+
+        info = self._make_info()
+        self.data[category][name] = info
+        self._index(category, name, info)
+
+    def remove_tool(self, category, name):
+        tools = self.data.get(category)
+        if not tools or name not in tools:
+            return False
+
+        self._unindex(category, name, tools.pop(name))
+        _sorted_remove(self.names[category], name)
+        self.search_index[category].remove(name)
+
+        # 카테고리가 비어있으면 제거
+        if not tools:
+            del self.data[category]
+            del self.names[category]
+            del self.available[category]
+            del self.borrowed[category]
+            del self.search_index[category]
+            del self.versions[category]
+            self.sorted_categories.remove(category)
+            self.category_index.remove(category)
+        return True
+
+    def set_borrower(self, category, name, b_id, b_name, b_nick, b_at):
+        info = self.get(category, name)
+        if info is None:
+            return False
+        self._unindex(category, name, info)
+        info.update(self._make_info(b_id, b_name, b_nick, b_at))
+        self._index(category, name, info)
+        return True
+
+    def clear_borrower(self, category, name):
+        return self.set_borrower(category, name, None, None, None, None)
+
+    # ==========================================
+    # [4] 보조 인덱스 관리
+    # ==========================================
+
+    def _index(self, category, name, info):
+        self.versions[category] = next(_version_seq)
+        b_id = info['borrower_id']
+        if b_id is None:
+            bisect.insort(self.available[category], name)
+        else:
+            bisect.insort(self.borrowed[category], name)
+            self.by_borrower.setdefault(b_id, set()).add((category, name))
+
+    def _unindex(self, category, name, info):
+        self.versions[category] = next(_version_seq)
+        b_id = info['borrower_id']
+        if b_id is None:
+            _sorted_remove(self.available[category], name)
+        else:
+            _sorted_remove(self.borrowed[category], name)
+            held = self.by_borrower.get(b_id)
+            if held is not None:
+                held.discard((category, name))
+                if not held:
+                    del self.by_borrower[b_id]
+
+
+class GuildToolCaches:
+    """길드별 ToolCache 파티션 모음
+
+    길드의 도구 목록은 그 길드에서 처음 사용될 때 DB에서 적재하고,
+    idle_ttl초 동안 쓰이지 않은 파티션은 evict_idle()에서 해제합니다.
+    max_partitions를 넘으면 가장 오래 안 쓴 파티션부터 해제합니다. (0이면 제한 없음)
+    메모리 사용량은 전체 등록 도구 수가 아니라 활동 중인 길드 수에 비례합니다.
+    """
+
+    def __init__(self, loader, idle_ttl=1800, max_partitions=0):
+        self._loader = loader  # async (guild_id) -> DB 행 목록
+        self.idle_ttl = idle_ttl
+        self.max_partitions = max_partitions
+        self.partitions = OrderedDict()  # { guild_id: ToolCache } (오래 안 쓴 순)
+        self.last_used = {}              # { guild_id: 마지막 사용 시각 (monotonic) }
+        self._loading = {}               # { guild_id: 적재 중인 Task } (중복 적재 방지)
+
+        self.loads = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.partitions)
+
+    def __contains__(self, guild_id):
+        return guild_id in self.partitions
+
+    async def get(self, guild_id):
+        """길드 파티션 반환 (없으면 DB에서 적재)
+
+        DB 커밋 후 캐시에 반영할 때도 이 함수로 가져와야
+        적재 도중의 변경이 빠지지 않습니다. (적재가 끝난 뒤 반영됨)
+        """
+        cache = self.partitions.get(guild_id)
+        if cache is None:
+            task = self._loading.get(guild_id)
+            if task is None:
+                task = asyncio.ensure_future(self._load(guild_id))
+                self._loading[guild_id] = task
+                task.add_done_callback(lambda _: self._loading.pop(guild_id, None))
+            cache = await asyncio.shield(task)
+
+            # 기다리는 사이 다른 길드 적재/유휴 정리/무효화로 해제됐을 수 있음
+            # (다시 넣지 않고 적재된 객체만 돌려줌, 다음 요청에서 DB 기준으로 새로 적재)
+            if self.partitions.get(guild_id) is not cache:
+                return cache
+
+        self.partitions.move_to_end(guild_id)
+        self.last_used[guild_id] = time.monotonic()
+        return cache
+
+    async def _load(self, guild_id):
+        cache = ToolCache()
+        cache.load(await self._loader(guild_id))
+        self.partitions[guild_id] = cache
+        self.last_used[guild_id] = time.monotonic()
+        self.loads += 1
+
+        # 개수 제한을 넘으면 가장 오래 안 쓴 파티션 해제
+        while self.max_partitions and len(self.partitions) > self.max_partitions:
+            old_id, _ = self.partitions.popitem(last=False)
+            self.last_used.pop(old_id, None)
+            self.evictions += 1
+        return cache
+
+    async def reload(self, guild_id):
+        """길드 파티션을 DB에서 다시 적재 (관리자 동기화 명령 전용)"""
+        self.invalidate(guild_id)
+        return await self.get(guild_id)
+
+    def invalidate(self, guild_id):
+        self.partitions.pop(guild_id, None)
+        self.last_used.pop(guild_id, None)
+
+    def evict_idle(self, now=None):
+        """idle_ttl초 이상 쓰이지 않은 파티션 해제 -> 해제한 개수"""
+        if not self.idle_ttl:
+            return 0
+        now = time.monotonic() if now is None else now
+        expired = [gid for gid, used in self.last_used.items() if now - used >= self.idle_ttl]
+        for guild_id in expired:
+            self.invalidate(guild_id)
+        self.evictions += len(expired)
+        return len(expired)
+
+    def stats(self):
+        return {
+            'partitions': len(self.partitions),
+            'tools': sum(len(cache) for cache in self.partitions.values()),
+            'loads': self.loads,
+            'evictions': self.evictions,
+        }
+
+
+def _sorted_remove(items, value):
+    """정렬된 리스트에서 값 하나를 이분 탐색으로 제거"""
+    idx = bisect.bisect_left(items, value)
+    if idx < len(items) and items[idx] == value:
+        del items[idx]